@@ -0,0 +1,113 @@
+from datetime import date, datetime
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from app import models
+from app.crud import UPSERT_INSERTS
+
+SALES_WATERMARK = "sales"
+
+# bucket name -> strftime pattern applied to SalesRollup.day
+BUCKET_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%Y-W%W",
+    "month": "%Y-%m",
+}
+
+def compact_sales(db: Session) -> int:
+    # Folds purchases newer than the watermark into the daily rollup table and
+    # returns how many purchases were folded in. Cost is proportional to new rows.
+    watermark = db.get(models.RollupWatermark, SALES_WATERMARK)
+    if watermark is None:
+        watermark = models.RollupWatermark(name=SALES_WATERMARK, last_id=0)
+        db.add(watermark)
+        db.flush()
+    last_id = watermark.last_id
+    upto = db.scalar(select(func.max(models.Purchase.id)))
+    if upto is None or upto <= last_id:
+        db.commit()
+        return 0
+
+    # Claim the range first; a concurrent compaction that lost the race sees
+    # rowcount 0 and backs off instead of double counting
+    claimed = db.execute(
+        update(models.RollupWatermark)
+        .where(models.RollupWatermark.name == SALES_WATERMARK, models.RollupWatermark.last_id == last_id)
+        .values(last_id=upto, updated_at=datetime.utcnow())
+    )
+    if claimed.rowcount != 1:
+        db.rollback()
+        return 0
+
+    purchase = models.Purchase
+    new_rows = (
+        select(
+            func.date(purchase.purchase_date),
+            purchase.item_type,
+            purchase.item_id,
+            func.sum(purchase.quantity),
+            func.sum(purchase.total_price),
+            func.count(),
+        )
+        .where(purchase.id > last_id, purchase.id <= upto)
+        .group_by(func.date(purchase.purchase_date), purchase.item_type, purchase.item_id)
+    )
+    stmt = UPSERT_INSERTS[db.get_bind().dialect.name](models.SalesRollup).from_select(
+        ["day", "item_type", "item_id", "quantity", "revenue", "orders"], new_rows
+    )
+    rollup = models.SalesRollup
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[rollup.day, rollup.item_type, rollup.item_id],
+        set_={
+            "quantity": rollup.quantity + stmt.excluded.quantity,
+            "revenue": rollup.revenue + stmt.excluded.revenue,
+            "orders": rollup.orders + stmt.excluded.orders,
+        },
+    ))
+    db.commit()
+    return upto - last_id
+
+def sales_report(
+    db: Session,
+    start: date | None,
+    end: date | None,
+    bucket: str,
+    group_by: str,
+    top: int,
+) -> dict:
+    rollup = models.SalesRollup
+    filters = []
+    if start is not None:
+        filters.append(rollup.day >= start)
+    if end is not None:
+        filters.append(rollup.day < end)
+
+    bucket_column = func.strftime(BUCKET_FORMATS[bucket], rollup.day).label("bucket")
+    group_columns = [bucket_column]
+    if group_by in ("item_type", "item"):
+        group_columns.append(rollup.item_type)
+    if group_by == "item":
+        group_columns.append(rollup.item_id)
+    totals = [
+        func.sum(rollup.quantity).label("quantity"),
+        func.round(func.sum(rollup.revenue), 2).label("revenue"),
+        func.sum(rollup.orders).label("orders"),
+    ]
+    buckets = db.execute(
+        select(*group_columns, *totals).where(*filters).group_by(*group_columns).order_by(*group_columns)
+    )
+    top_sellers = db.execute(
+        select(rollup.item_type, rollup.item_id, *totals)
+        .where(*filters)
+        .group_by(rollup.item_type, rollup.item_id)
+        .order_by(func.sum(rollup.revenue).desc())
+        .limit(top)
+    )
+    watermark = db.get(models.RollupWatermark, SALES_WATERMARK)
+    return {
+        # When purchases were last folded into the rollups
+        "as_of": watermark.updated_at if watermark is not None else None,
+        "bucket": bucket,
+        "group_by": group_by,
+        "buckets": [dict(row._mapping) for row in buckets],
+        "top_sellers": [dict(row._mapping) for row in top_sellers],
+    }
@@ -1,18 +1,40 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app import models
+from sqlalchemy import event, inspect, select
+from app.database import get_session
+from app import invalidation, models
+from app.cache import TTLCache
+from app.hashing import hash_pool
 from passlib.context import CryptContext
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+import os
+import time
 
 SECRET_KEY = "your-secret-key"  # Replace with a secure key in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = 7
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", "60"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/login", auto_error=False)
+
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+# token -> (username, exp) and username -> Principal, so an authenticated
+# request normally needs neither a signature check nor a user query
+token_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+principal_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    is_admin: bool
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
@@ -20,6 +42,12 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def get_password_hash_async(password: str) -> str:
+    return await hash_pool.run(pwd_context.hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hash_pool.run(pwd_context.verify, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -30,17 +58,79 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str) -> dict | None:
+def create_refresh_token(username: str, expire: datetime | None = None) -> str:
+    # Refreshing passes the old token's expiry on, so a session ends
+    # REFRESH_TOKEN_EXPIRE_DAYS after login however often it is refreshed
+    if expire is None:
+        expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    return jwt.encode({"sub": username, "type": "refresh", "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+def create_stream_token(username: str) -> str:
+    # Only opens event streams; it travels in the URL, so it is kept short-lived
+    expire = datetime.now(timezone.utc) + timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    return jwt.encode({"sub": username, "type": "stream", "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+def _decode_typed_token(token: str, token_type: str) -> dict | None:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("type") != token_type or payload.get("sub") is None:
+        return None
+    return payload
+
+def verify_refresh_token(token: str) -> dict | None:
+    payload = _decode_typed_token(token, "refresh")
+    if payload is None:
+        return None
+    return {"username": payload["sub"], "expires_at": datetime.fromtimestamp(payload["exp"], timezone.utc)}
+
+def verify_stream_token(token: str) -> str | None:
+    payload = _decode_typed_token(token, "stream")
+    return None if payload is None else payload["sub"]
+
+def verify_token(token: str) -> dict | None:
+    key = ("token", token)
+    entry = token_cache.get(key)
+    if entry is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
         username: str = payload.get("sub")
-        if username is None:
+        # Refresh and stream tokens only work on their own endpoints
+        if username is None or payload.get("type") is not None:
             return None
-        return {"username": username}
-    except JWTError:
+        entry = (username, payload.get("exp"))
+        token_cache.set(key, entry)
+    username, exp = entry
+    if exp is not None and exp <= time.time():
+        token_cache.delete(key)
         return None
+    return {"username": username}
+
+def invalidate_user(username: str):
+    principal_cache.delete(("user", username))
+
+invalidation.register("principals", principal_cache)
+
+# Other workers drop all their cached principals when any user changes; user
+# writes are rare and one version row per user would grow without bound
+@event.listens_for(models.User, "after_update")
+def _invalidate_updated_user(mapper, connection, target):
+    if inspect(target).attrs.username.history.has_changes():
+        # The old username may not be loaded, so drop every cached principal
+        principal_cache.invalidate("user")
+    else:
+        invalidate_user(target.username)
+    invalidation.publish_in_flush(connection, "principals", "user")
+
+@event.listens_for(models.User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target):
+    principal_cache.invalidate("user")
+    invalidation.publish_in_flush(connection, "principals", "user")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_session)) -> Principal:
     credentials = verify_token(token)
     if credentials is None:
         raise HTTPException(
@@ -48,7 +138,34 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(models.User).filter(models.User.username == credentials["username"]).first()
-    if user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
\ No newline at end of file
+    return await resolve_principal(db, credentials["username"])
+
+async def get_stream_user(
+    token: str | None = Depends(optional_oauth2_scheme),
+    stream_token: str | None = Query(None, alias="token"),
+    db=Depends(get_session),
+) -> Principal:
+    # EventSource can't set headers, so event streams also take ?token= holding
+    # a stream token from POST /requests/stream/token, never an access token
+    if token:
+        return await get_current_user(token, db)
+    username = verify_stream_token(stream_token) if stream_token else None
+    if username is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await resolve_principal(db, username)
+
+async def resolve_principal(db, username: str) -> Principal:
+    key = ("user", username)
+    principal = principal_cache.get(key)
+    if principal is None:
+        generation = principal_cache.generation("user")
+        user = await db.scalar(select(models.User).filter(models.User.username == username))
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        principal = Principal(id=user.id, username=user.username, is_admin=bool(user.is_admin))
+        principal_cache.set(key, principal, generation)
+    return principal
\ No newline at end of file
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, List
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from app import fastjson
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._generations: dict = {}
+        # Bumped by a full clear; part of every namespace's generation
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def _generation(self, namespace: str) -> int:
+        # Both parts only grow, so any invalidation changes the sum
+        return self._epoch + self._generations.get(namespace, 0)
+
+    def generation(self, namespace: str) -> int:
+        with self._lock:
+            return self._generation(namespace)
+
+    def set(self, key, value, generation: int | None = None):
+        with self._lock:
+            if generation is not None and generation != self._generation(key[0]):
+                # Invalidated while the value was being built; don't cache stale data
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._generations[key[0]] = self._generations.get(key[0], 0) + 1
+            self.invalidations += 1
+
+    def invalidate(self, namespace: str | None = None):
+        # Keys are (namespace, ...) tuples; no namespace clears everything
+        with self._lock:
+            if namespace is None:
+                self._data.clear()
+                self._epoch += 1
+            else:
+                for key in [key for key in self._data if key[0] == namespace]:
+                    del self._data[key]
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+catalog_cache = TTLCache(
+    maxsize=int(os.getenv("CATALOG_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("CATALOG_CACHE_TTL", "300")),
+)
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+async def cached_list_response(namespace: str, params: tuple, load: Callable, schema, model) -> Response:
+    # await load(columns) returns (rows, next_cursor); the serialized page is what gets cached.
+    # columns is None for ORM rows, or the schema's columns when fast JSON is on
+    key = (namespace, *params)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        generation = catalog_cache.generation(namespace)
+        if fastjson.FAST_JSON_RESPONSES:
+            rows, next_cursor = await load(fastjson.columns_for(model, schema))
+            body = fastjson.dumps_rows(rows)
+        else:
+            rows, next_cursor = await load(None)
+            adapter = _list_adapter(schema)
+            body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+        entry = (body, next_cursor)
+        catalog_cache.set(key, entry, generation)
+    body, next_cursor = entry
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,207 @@
+import argparse
+import csv
+import json
+import sys
+from datetime import datetime
+from typing import BinaryIO, Iterable, Iterator
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app import invalidation, models, schemas
+from app.crud import UPSERT_INSERTS
+from app.database import SessionLocal, SQLALCHEMY_DATABASE_URL
+
+IMPORT_TYPES = {
+    "product": (models.Product, schemas.ProductCreate, "products"),
+    "service": (models.Service, schemas.ServiceCreate, "services"),
+    "tutorial": (models.Tutorial, schemas.TutorialCreate, "tutorials"),
+}
+FORMATS = ("csv", "ndjson")
+DEFAULT_BATCH_SIZE = 1000
+# Keep the report bounded even for a feed where every row is bad
+MAX_REPORTED_ERRORS = 1000
+
+class ImportReport:
+    def __init__(self, item_type: str):
+        self.item_type = item_type
+        self.processed = 0
+        self.inserted = 0
+        self.upserted = 0
+        self.failed = 0
+        self.errors = []
+        # Set when the import stopped before the end of the file
+        self.aborted = None
+
+    def add_error(self, row: int, errors: list):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "errors": errors})
+
+    def as_dict(self) -> dict:
+        return {
+            "item_type": self.item_type,
+            "processed": self.processed,
+            "inserted": self.inserted,
+            "upserted": self.upserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "aborted": self.aborted,
+        }
+
+def detect_format(filename: str | None) -> str | None:
+    if filename:
+        if filename.endswith(".csv"):
+            return "csv"
+        if filename.endswith((".ndjson", ".jsonl")):
+            return "ndjson"
+    return None
+
+def decode_lines(source: BinaryIO) -> Iterator[str]:
+    # Decoded line by line, so invalid UTF-8 surfaces at the row that holds it
+    for line in source:
+        yield line.decode("utf-8")
+
+def iter_records(lines: Iterable[str], fmt: str) -> Iterator[dict | Exception]:
+    # Yields one dict per data row, or the parse error for that row
+    if fmt == "csv":
+        for record in csv.DictReader(lines):
+            # Empty CSV cells mean "not given", like a missing NDJSON key
+            yield {key: value for key, value in record.items() if key and value != ""}
+    else:
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield exc
+                continue
+            yield record if isinstance(record, dict) else ValueError("Row is not a JSON object")
+
+def _row_values(record: dict, schema) -> dict:
+    item = schema.model_validate(record)
+    values = item.model_dump()
+    if values.get("posted_date") is None:
+        # Core inserts skip column defaults for keys that are present
+        values["posted_date"] = datetime.utcnow()
+    if "id" in record:
+        values["id"] = int(record["id"])
+    return values
+
+def _write_batch(db: Session, model, rows: list[dict]):
+    table = model.__table__
+    new_rows = [row for row in rows if "id" not in row]
+    keyed_rows = [row for row in rows if "id" in row]
+    if new_rows:
+        db.execute(insert(table), new_rows)
+    if keyed_rows:
+        upsert = UPSERT_INSERTS[make_url(SQLALCHEMY_DATABASE_URL).get_backend_name()](table)
+        columns = [key for key in keyed_rows[0] if key != "id"]
+        db.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={column: upsert.excluded[column] for column in columns},
+            ),
+            keyed_rows,
+        )
+    db.commit()
+    return len(new_rows), len(keyed_rows)
+
+def import_catalog(
+    db: Session,
+    item_type: str,
+    lines: Iterable[str],
+    fmt: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict:
+    model, schema, _ = IMPORT_TYPES[item_type]
+    report = ImportReport(item_type)
+    batch, batch_rows = [], []
+
+    def flush():
+        try:
+            inserted, upserted = _write_batch(db, model, batch)
+        except SQLAlchemyError as exc:
+            db.rollback()
+            for row in batch_rows:
+                report.add_error(row, [str(exc.orig if hasattr(exc, "orig") else exc)])
+        else:
+            report.inserted += inserted
+            report.upserted += upserted
+        batch.clear()
+        batch_rows.clear()
+
+    row = 0
+    try:
+        for row, record in enumerate(iter_records(lines, fmt), start=1):
+            report.processed += 1
+            if isinstance(record, Exception):
+                report.add_error(row, [str(record)])
+                continue
+            try:
+                values = _row_values(record, schema)
+            except ValidationError as exc:
+                report.add_error(row, [
+                    {"loc": list(error["loc"]), "msg": error["msg"]} for error in exc.errors(include_url=False)
+                ])
+                continue
+            except (TypeError, ValueError) as exc:
+                report.add_error(row, [str(exc)])
+                continue
+            batch.append(values)
+            batch_rows.append(row)
+            if len(batch) >= batch_size:
+                flush()
+    except UnicodeDecodeError as exc:
+        # Nothing from here on can be read; earlier batches are already
+        # committed, so report them and stop
+        report.add_error(row + 1, [f"File is not valid UTF-8: {exc.reason}"])
+        report.aborted = "invalid UTF-8"
+    if batch:
+        flush()
+    return report.as_dict()
+
+def import_and_publish(db: Session, item_type: str, lines: Iterable[str], fmt: str, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    # Every entry point imports through here so all workers drop their cached
+    # catalog pages afterwards
+    namespace = IMPORT_TYPES[item_type][2]
+    try:
+        report = import_catalog(db, item_type, lines, fmt, batch_size)
+    except Exception:
+        # Batches before the failure are already committed, so the caches are
+        # stale either way; the session may be mid-transaction, so roll back first
+        db.rollback()
+        invalidation.publish(db, "catalog", namespace)
+        db.commit()
+        raise
+    invalidation.publish(db, "catalog", namespace)
+    db.commit()
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import catalog items from CSV or NDJSON")
+    parser.add_argument("item_type", choices=sorted(IMPORT_TYPES))
+    parser.add_argument("path", help="file to import, or - for stdin")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        parser.error("cannot tell the format from the file name; pass --format")
+    source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    db = SessionLocal()
+    try:
+        with source:
+            report = import_and_publish(db, args.item_type, decode_lines(source), fmt, args.batch_size)
+    finally:
+        db.close()
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
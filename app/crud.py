@@ -1,9 +1,28 @@
+from sqlalchemy import literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import Session
 from . import models, schemas
+from .database import SQLALCHEMY_DATABASE_URL
+from .pagination import DEFAULT_LIMIT, SortOption, filter_price, paginate, paginate_async
 from datetime import date
 
-def get_products(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Product).offset(skip).limit(limit).all()
+UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+def get_products(
+    db: Session,
+    type: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    sort: SortOption = SortOption.newest,
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+):
+    query = db.query(models.Product)
+    if type is not None:
+        query = query.filter(models.Product.type == type)
+    query = filter_price(query, models.Product, min_price, max_price)
+    return paginate(query, models.Product, sort, cursor, limit)
 
 def get_product(db: Session, product_id: int):
     return db.query(models.Product).filter(models.Product.id == product_id).first()
@@ -42,8 +61,20 @@ def delete_product(db: Session, product_id: int):
         db.commit()
     return db_product
 
-def get_tutorials(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Tutorial).offset(skip).limit(limit).all()
+def get_tutorials(
+    db: Session,
+    tutorial_type: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    sort: SortOption = SortOption.newest,
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+):
+    query = db.query(models.Tutorial)
+    if tutorial_type is not None:
+        query = query.filter(models.Tutorial.tutorial_type == tutorial_type)
+    query = filter_price(query, models.Tutorial, min_price, max_price)
+    return paginate(query, models.Tutorial, sort, cursor, limit)
 
 def get_tutorial(db: Session, tutorial_id: int):
     return db.query(models.Tutorial).filter(models.Tutorial.id == tutorial_id).first()
@@ -84,6 +115,21 @@ def delete_tutorial(db: Session, tutorial_id: int):
         db.commit()
     return db_tutorial
 
+def get_services(
+    db: Session,
+    category: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    sort: SortOption = SortOption.newest,
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+):
+    query = db.query(models.Service)
+    if category is not None:
+        query = query.filter(models.Service.category == category)
+    query = filter_price(query, models.Service, min_price, max_price)
+    return paginate(query, models.Service, sort, cursor, limit)
+
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
@@ -92,4 +138,167 @@ def create_user(db: Session, username: str, hashed_password: str):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
-    return db_user
\ No newline at end of file
+    return db_user
+
+# Async variants. `db` is an AsyncSession, or a ThreadedSession in sync mode.
+
+async def get_products_async(
+    db,
+    type: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    sort: SortOption = SortOption.newest,
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+    columns: tuple | None = None,
+):
+    stmt = select(*columns) if columns else select(models.Product)
+    if type is not None:
+        stmt = stmt.filter(models.Product.type == type)
+    stmt = filter_price(stmt, models.Product, min_price, max_price)
+    return await paginate_async(db, stmt, models.Product, sort, cursor, limit, as_rows=columns is not None)
+
+async def get_product_async(db, product_id: int):
+    return await db.get(models.Product, product_id)
+
+async def create_product_async(db, product: schemas.ProductCreate):
+    db_product = models.Product(
+        name=product.name,
+        type=product.type,
+        price=product.price,
+        description=product.description,
+        image=product.image or "/products/placeholder.jpg",
+        posted_date=product.posted_date
+    )
+    db.add(db_product)
+    await db.commit()
+    await db.refresh(db_product)
+    return db_product
+
+async def update_product_async(db, product_id: int, product: schemas.ProductCreate):
+    db_product = await db.get(models.Product, product_id)
+    if db_product:
+        db_product.name = product.name
+        db_product.type = product.type
+        db_product.price = product.price
+        db_product.description = product.description
+        db_product.image = product.image or "/products/placeholder.jpg"
+        db_product.posted_date = product.posted_date
+        await db.commit()
+        await db.refresh(db_product)
+    return db_product
+
+async def delete_product_async(db, product_id: int):
+    db_product = await db.get(models.Product, product_id)
+    if db_product:
+        await db.delete(db_product)
+        await db.commit()
+    return db_product
+
+async def get_tutorials_async(
+    db,
+    tutorial_type: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    sort: SortOption = SortOption.newest,
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+    columns: tuple | None = None,
+):
+    stmt = select(*columns) if columns else select(models.Tutorial)
+    if tutorial_type is not None:
+        stmt = stmt.filter(models.Tutorial.tutorial_type == tutorial_type)
+    stmt = filter_price(stmt, models.Tutorial, min_price, max_price)
+    return await paginate_async(db, stmt, models.Tutorial, sort, cursor, limit, as_rows=columns is not None)
+
+async def get_tutorial_async(db, tutorial_id: int):
+    return await db.get(models.Tutorial, tutorial_id)
+
+async def create_tutorial_async(db, tutorial: schemas.TutorialCreate):
+    db_tutorial = models.Tutorial(
+        title=tutorial.title,
+        content=tutorial.content,
+        tutorial_type=tutorial.tutorial_type,
+        price=tutorial.price,
+        posted_date=tutorial.posted_date,
+        video_url=tutorial.video_url,
+        video_file=tutorial.video_file
+    )
+    db.add(db_tutorial)
+    await db.commit()
+    await db.refresh(db_tutorial)
+    return db_tutorial
+
+async def update_tutorial_async(db, tutorial_id: int, tutorial: schemas.TutorialCreate):
+    db_tutorial = await db.get(models.Tutorial, tutorial_id)
+    if db_tutorial:
+        db_tutorial.title = tutorial.title
+        db_tutorial.content = tutorial.content
+        db_tutorial.tutorial_type = tutorial.tutorial_type
+        db_tutorial.price = tutorial.price
+        db_tutorial.posted_date = tutorial.posted_date
+        db_tutorial.video_url = tutorial.video_url
+        db_tutorial.video_file = tutorial.video_file
+        await db.commit()
+        await db.refresh(db_tutorial)
+    return db_tutorial
+
+async def delete_tutorial_async(db, tutorial_id: int):
+    db_tutorial = await db.get(models.Tutorial, tutorial_id)
+    if db_tutorial:
+        await db.delete(db_tutorial)
+        await db.commit()
+    return db_tutorial
+
+async def get_services_async(
+    db,
+    category: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    sort: SortOption = SortOption.newest,
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+    columns: tuple | None = None,
+):
+    stmt = select(*columns) if columns else select(models.Service)
+    if category is not None:
+        stmt = stmt.filter(models.Service.category == category)
+    stmt = filter_price(stmt, models.Service, min_price, max_price)
+    return await paginate_async(db, stmt, models.Service, sort, cursor, limit, as_rows=columns is not None)
+
+async def get_user_by_username_async(db, username: str):
+    return await db.scalar(select(models.User).filter(models.User.username == username))
+
+async def create_user_async(db, username: str, hashed_password: str):
+    db_user = models.User(username=username, hashed_password=hashed_password)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+def _cart_upsert(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=[models.CartItem.user_id, models.CartItem.item_type, models.CartItem.item_id],
+        set_={"quantity": models.CartItem.quantity + stmt.excluded.quantity},
+    ).returning(models.CartItem)
+
+def _cart_insert():
+    return UPSERT_INSERTS[make_url(SQLALCHEMY_DATABASE_URL).get_backend_name()](models.CartItem)
+
+async def add_cart_item_async(db, user_id: int, item_type: str, item_id: int, quantity: int):
+    # INSERT ... SELECT yields no row when the catalog item does not exist, so
+    # the existence check, insert-or-increment and reload are one statement
+    model = models.CATALOG_MODELS[item_type]
+    stmt = _cart_insert().from_select(
+        ["user_id", "item_type", "item_id", "quantity"],
+        select(literal(user_id), literal(item_type), model.id, literal(quantity)).where(model.id == item_id),
+    )
+    return await db.scalar(_cart_upsert(stmt), execution_options={"populate_existing": True})
+
+async def add_cart_items_async(db, user_id: int, items: list[tuple[str, int, int]]):
+    # items are (item_type, item_id, quantity) with unique keys
+    stmt = _cart_insert().values([
+        {"user_id": user_id, "item_type": item_type, "item_id": item_id, "quantity": quantity}
+        for item_type, item_id, quantity in items
+    ])
+    return (await db.scalars(_cart_upsert(stmt), execution_options={"populate_existing": True})).all()
\ No newline at end of file
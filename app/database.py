@@ -1,12 +1,68 @@
-from sqlalchemy import create_engine
+from collections import Counter
+from contextvars import ContextVar
+from fastapi import Depends
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app import storage
+import logging
+import os
+import time
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"  # Adjust as needed
+logger = logging.getLogger(__name__)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+SQLALCHEMY_DATABASE_URL = storage.DATABASE_URL
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL", SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
 )
+
+# Per-request query counting and timing; the engine hooks are only installed when on
+DB_QUERY_STATS = os.getenv("DB_QUERY_STATS", "0") in ("1", "true", "True")
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+# The same statement run this many times in one request is reported as a likely N+1
+DB_REPEATED_QUERY_THRESHOLD = int(os.getenv("DB_REPEATED_QUERY_THRESHOLD", "5"))
+
+# "sync" runs hot-route queries on the threadpool, "async" on an AsyncEngine
+DB_MODE = os.getenv("DB_MODE", "sync")
+ASYNC_DB = DB_MODE == "async"
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # Statement text is already parameterized, so equal text means equal shape
+        self.statements = Counter()
+
+    def repeated(self, threshold: int = DB_REPEATED_QUERY_THRESHOLD) -> list[tuple[str, int]]:
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+# Set per request by the query stats middleware. The object is mutated rather
+# than replaced, so queries run on threadpool copies of the context still land in it
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.query_started
+    stats = query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.statements[statement] += 1
+    if elapsed * 1000 >= DB_SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms): %s parameters=%r", elapsed * 1000, statement, parameters)
+
+def instrument(engine):
+    # Accepts the sync engine, or AsyncEngine.sync_engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **storage.engine_options(SQLALCHEMY_DATABASE_URL))
+storage.configure(engine)
+if DB_QUERY_STATS:
+    instrument(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -16,4 +72,71 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+class ThreadedSession:
+    # Presents the awaitable AsyncSession interface over a sync Session so the
+    # async handlers and crud functions run unchanged in sync mode
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    def _execute_buffered(self, *args, **kwargs):
+        # Fetching rows and building ORM objects happen here on the worker
+        # thread, so the caller gets a result that never touches the database
+        result = self.sync_session.execute(*args, **kwargs)
+        if not getattr(result, "returns_rows", True):
+            # DML without RETURNING, where only the rowcount is read
+            return result
+        return result.freeze()()
+
+    async def execute(self, *args, **kwargs):
+        return await run_in_threadpool(self._execute_buffered, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return (await self.execute(*args, **kwargs)).scalars()
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance):
+        await run_in_threadpool(self.sync_session.refresh, instance)
+
+if ASYNC_DB:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **storage.engine_options(ASYNC_DATABASE_URL))
+    storage.configure(async_engine.sync_engine)
+    if DB_QUERY_STATS:
+        instrument(async_engine.sync_engine)
+    # Objects stay loaded after commit; lazy refreshes are not possible on an async session
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    get_session = get_async_db
+else:
+    async def get_session(db: Session = Depends(get_db)):
+        yield ThreadedSession(db)
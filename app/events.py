@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import anyio
+from sqlalchemy import delete, event as orm_event, func, select
+from sqlalchemy.orm import Session
+from app import models
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+SSE_RETRY_MS = 3000
+# Events are written to request_events by whichever worker handled the change,
+# and every worker with open streams polls for new rows this often. Commits on
+# this worker wake the poller straight away
+EVENT_POLL_INTERVAL = float(os.getenv("EVENT_POLL_INTERVAL", "1.0"))
+EVENT_POLL_BATCH = 500
+# How far back Last-Event-ID can resume from; older clients get a resync
+EVENT_RETENTION_SECONDS = int(os.getenv("EVENT_RETENTION_SECONDS", "86400"))
+EVENT_REPLAY_LIMIT = int(os.getenv("EVENT_REPLAY_LIMIT", "1000"))
+
+_PENDING = "request_events"
+
+RESYNC = "event: resync\ndata: {}\n\n"
+
+@dataclass
+class Event:
+    id: int
+    user_id: int
+    type: str
+    data: str  # JSON
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n"
+
+@dataclass(eq=False)
+class Subscriber:
+    # user_id None receives every user's events (admins)
+    user_id: int | None
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(SUBSCRIBER_QUEUE_SIZE))
+    overflowed: bool = False
+
+    def wants(self, event: Event) -> bool:
+        return self.user_id is None or self.user_id == event.user_id
+
+    def deliver(self, event: Event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client; it gets a resync rather than holding memory
+            self.overflowed = True
+
+def publish(db: Session, user_id: int, event_type: str, data: dict):
+    # Written in the caller's transaction, so the event exists exactly when the change does
+    db.add(models.RequestEvent(
+        user_id=user_id, type=event_type, data=json.dumps(data, separators=(",", ":")), created_date=datetime.utcnow()
+    ))
+    if not db.info.get(_PENDING):
+        db.info[_PENDING] = True
+        orm_event.listen(db, "after_commit", _wake_after_commit, once=True)
+
+def _wake_after_commit(session):
+    session.info.pop(_PENDING, None)
+    broker.wake()
+
+def _rows_to_events(rows) -> list[Event]:
+    return [Event(row.id, row.user_id, row.type, row.data) for row in rows]
+
+def _read_after(last_id: int, limit: int, user_id: int | None = None) -> list[Event]:
+    stmt = select(models.RequestEvent).where(models.RequestEvent.id > last_id)
+    if user_id is not None:
+        stmt = stmt.where(models.RequestEvent.user_id == user_id)
+    with SessionLocal() as db:
+        return _rows_to_events(db.scalars(stmt.order_by(models.RequestEvent.id).limit(limit)))
+
+def _latest_id() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.max(models.RequestEvent.id))) or 0
+
+def _replay(user_id: int | None, last_event_id: str | None) -> tuple[list[Event], bool, int]:
+    # Returns (missed events, whether the client must resync, id the stream is caught up to)
+    with SessionLocal() as db:
+        oldest, latest = db.execute(select(func.min(models.RequestEvent.id), func.max(models.RequestEvent.id))).one()
+    latest = latest or 0
+    if not last_event_id:
+        return [], False, latest
+    try:
+        last_id = int(last_event_id)
+    except ValueError:
+        return [], True, latest
+    if last_id > latest or (oldest is not None and last_id + 1 < oldest):
+        # From another database, or older than the retained events
+        return [], True, latest
+    missed = _read_after(last_id, EVENT_REPLAY_LIMIT + 1, user_id)
+    if len(missed) > EVENT_REPLAY_LIMIT:
+        return [], True, latest
+    return missed, False, max([latest] + [event.id for event in missed])
+
+def _purge(older_than_seconds: int = EVENT_RETENTION_SECONDS) -> int:
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than_seconds)
+    with SessionLocal() as db:
+        result = db.execute(delete(models.RequestEvent).where(models.RequestEvent.created_date < cutoff))
+        db.commit()
+    return result.rowcount
+
+class Broker:
+    # Fans request_events rows out to this worker's open streams. Lives on the
+    # event loop; only wake() may be called from other threads
+    def __init__(self, poll_interval: float = EVENT_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.last_id = None
+        self.delivered = 0
+        self._subscribers: set[Subscriber] = set()
+        self._wake = asyncio.Event()
+        self._loop = None
+        self._task: asyncio.Task | None = None
+        self._last_purge = 0.0
+
+    def subscribe(self, user_id: int | None) -> Subscriber:
+        subscriber = Subscriber(user_id)
+        self._subscribers.add(subscriber)
+        self._wake.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def wake(self):
+        # Safe from any thread; commits on the threadpool land here
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def dispatch(self, events: list[Event]):
+        for event in events:
+            self.last_id = max(self.last_id or 0, event.id)
+            for subscriber in list(self._subscribers):
+                if subscriber.wants(event):
+                    subscriber.deliver(event)
+                    self.delivered += 1
+
+    async def poll(self):
+        if self.last_id is None:
+            self.last_id = await anyio.to_thread.run_sync(_latest_id)
+            return
+        while True:
+            events = await anyio.to_thread.run_sync(_read_after, self.last_id, EVENT_POLL_BATCH)
+            self.dispatch(events)
+            if len(events) < EVENT_POLL_BATCH:
+                return
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+
+    async def _run(self):
+        while True:
+            try:
+                if self._subscribers or self.last_id is None:
+                    await self.poll()
+                if time.monotonic() - self._last_purge > 3600:
+                    self._last_purge = time.monotonic()
+                    await anyio.to_thread.run_sync(_purge)
+            except Exception:
+                logger.exception("Could not read request events")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self._subscribers), "last_id": self.last_id, "delivered": self.delivered}
+
+broker = Broker()
+
+async def event_stream(user_id: int | None, last_event_id: str | None):
+    # Subscribed before the replay is read so nothing committed in between is
+    # lost; live events the replay already covered are skipped by id
+    subscriber = broker.subscribe(user_id)
+    try:
+        missed, resync, caught_up_to = await anyio.to_thread.run_sync(_replay, user_id, last_event_id)
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        if resync:
+            yield RESYNC
+        for event in missed:
+            yield event.encode()
+        while True:
+            if subscriber.overflowed:
+                subscriber.overflowed = False
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                yield RESYNC
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            if event.id > caught_up_to:
+                yield event.encode()
+    finally:
+        broker.unsubscribe(subscriber)
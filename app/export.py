@@ -0,0 +1,41 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator
+from app.database import SessionLocal
+
+EXPORT_BATCH_SIZE = 1000
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _encode_batch(columns: list[str], rows, fmt: str) -> bytes:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+        )
+        return buffer.getvalue().encode()
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=_json_default, separators=(",", ":")) + "\n" for row in rows
+    ).encode()
+
+def stream_rows(stmt, fmt: str) -> Iterator[bytes]:
+    # Owns its session: the response body is produced after the request's
+    # dependencies may already have been cleaned up
+    columns = [column.name for column in stmt.selected_columns]
+    db = SessionLocal()
+    try:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(columns)
+            yield buffer.getvalue().encode()
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            yield _encode_batch(columns, rows, fmt)
+    finally:
+        db.close()
@@ -0,0 +1,45 @@
+import json
+import os
+from datetime import date, datetime
+from functools import lru_cache
+from sqlalchemy import Float, cast
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback keeps the fast path usable
+    orjson = None
+
+# Opt-in: list routes select plain row tuples and encode them directly instead
+# of building ORM objects and validating them through the response schema
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "0") in ("1", "true", "True")
+
+@lru_cache(maxsize=None)
+def columns_for(model, schema) -> tuple:
+    # One labelled column per schema field, in schema order so the JSON keys
+    # match what the response model would produce. Float columns are cast in
+    # SQL because SQLite hands back integers for whole-number prices
+    columns = []
+    for name in schema.model_fields:
+        column = getattr(model, name)
+        if isinstance(column.type, Float):
+            column = cast(column, Float).label(name)
+        columns.append(column)
+    return tuple(columns)
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+def dumps_rows(rows) -> bytes:
+    # zip over the shared field names is several times cheaper than Row._asdict()
+    rows = list(rows)
+    if not rows:
+        return b"[]"
+    keys = rows[0]._fields
+    return dumps([dict(zip(keys, row)) for row in rows])
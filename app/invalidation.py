@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+import anyio
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app import models
+from app.cache import TTLCache, catalog_cache
+from app.crud import UPSERT_INSERTS
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# How often each worker reads cache_versions, which bounds how long a worker
+# can keep serving entries another worker's write has made stale. 0 disables
+CACHE_SYNC_INTERVAL = float(os.getenv("CACHE_SYNC_INTERVAL", "1.0"))
+
+_PENDING = "cache_invalidations"
+
+# name -> cache; versions are stored as "<name>:<namespace>"
+CACHES: dict[str, TTLCache] = {"catalog": catalog_cache}
+
+def register(name: str, cache: TTLCache):
+    CACHES[name] = cache
+
+def _bump(dialect_name: str, cache_name: str, namespace: str):
+    version = models.CacheVersion
+    stmt = UPSERT_INSERTS[dialect_name](version).values(
+        name=f"{cache_name}:{namespace}", version=1, updated_at=datetime.utcnow()
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[version.name],
+        set_={"version": version.version + 1, "updated_at": stmt.excluded.updated_at},
+    )
+
+def publish(db: Session, cache_name: str, namespace: str):
+    # Bumps the version in the caller's transaction, so it commits, or rolls
+    # back, with the write itself. This worker drops its entries once the
+    # commit lands; the others do on their next check
+    db.execute(_bump(db.get_bind().dialect.name, cache_name, namespace))
+    pending = db.info.setdefault(_PENDING, set())
+    if not pending:
+        event.listen(db, "after_commit", _invalidate_after_commit, once=True)
+    pending.add((cache_name, namespace))
+
+def publish_in_flush(connection, cache_name: str, namespace: str):
+    # For mapper events, which run inside a flush and write through its connection.
+    # Local invalidation is left to the caller
+    connection.execute(_bump(connection.dialect.name, cache_name, namespace))
+
+def _invalidate_after_commit(session):
+    for cache_name, namespace in session.info.pop(_PENDING, ()):
+        CACHES[cache_name].invalidate(namespace)
+
+class VersionWatcher:
+    # Polls the handful of version rows and invalidates whatever changed since
+    # the last look. Its own worker's bumps come back too and cost one extra miss
+    def __init__(self, interval: float = CACHE_SYNC_INTERVAL):
+        self.interval = interval
+        self.seen: dict[str, int] | None = None
+        self.checks = 0
+        self.invalidations = 0
+        self.last_checked = None
+        self._task: asyncio.Task | None = None
+
+    def _read(self) -> dict[str, int]:
+        version = models.CacheVersion
+        with SessionLocal() as db:
+            return dict(db.execute(select(version.name, version.version)).all())
+
+    def check(self, baseline: bool = False) -> list[str]:
+        versions = self._read()
+        if baseline:
+            # At startup nothing has been cached against older versions yet
+            changed = []
+        elif self.seen is None:
+            # Earlier checks failed, so any change may have been missed
+            changed = list(versions)
+            for cache in CACHES.values():
+                cache.invalidate()
+        else:
+            changed = [name for name, version in versions.items() if self.seen.get(name) != version]
+        self.seen = versions
+        self.checks += 1
+        self.last_checked = datetime.utcnow()
+        for name in changed:
+            cache_name, _, namespace = name.partition(":")
+            cache = CACHES.get(cache_name)
+            if cache is not None:
+                cache.invalidate(namespace)
+                self.invalidations += 1
+        return changed
+
+    async def start(self):
+        if self.interval <= 0:
+            return
+        try:
+            await anyio.to_thread.run_sync(self.check, True)
+        except Exception:
+            logger.exception("Could not read cache versions")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await anyio.to_thread.run_sync(self.check)
+            except Exception:
+                logger.exception("Could not read cache versions")
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "checks": self.checks,
+            "invalidations": self.invalidations,
+            "last_checked": self.last_checked,
+            "versions": self.seen or {},
+        }
+
+watcher = VersionWatcher()
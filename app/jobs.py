@@ -0,0 +1,300 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+import anyio
+from sqlalchemy import and_, delete, event, func, or_, select, update
+from sqlalchemy.orm import Session
+from app import models
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# A running job whose lease ran out (its worker died or hung) is picked up again
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_BACKOFF = float(os.getenv("JOB_MAX_BACKOFF", "3600"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+JOB_SHUTDOWN_TIMEOUT = float(os.getenv("JOB_SHUTDOWN_TIMEOUT", "10"))
+# How many finished jobs the latency stats look back over
+JOB_STATS_WINDOW = 1000
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+@dataclass
+class JobType:
+    handler: Callable
+    concurrency: int = 1
+    max_attempts: int = 5
+    backoff: float = 5.0
+    # Finishing one run also settles every job of this type queued before it
+    # started, for work like "recompute X" where one run covers them all
+    coalesce: bool = False
+
+JOB_TYPES: dict[str, JobType] = {}
+
+def register(name: str, concurrency: int = 1, max_attempts: int = 5, backoff: float = 5.0, coalesce: bool = False):
+    # Handlers are plain functions (db: Session, payload: dict) run on a worker
+    # thread with their own session; they should be safe to run more than once
+    def decorator(handler: Callable):
+        JOB_TYPES[name] = JobType(handler, concurrency, max_attempts, backoff, coalesce)
+        return handler
+    return decorator
+
+def enqueue(db, job_type: str, payload: dict | None = None, priority: int = 0, delay: float = 0) -> models.Job:
+    # Adds the job to the caller's session so it commits, or rolls back, with
+    # the request's own writes. Works with Session, AsyncSession and ThreadedSession
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Unknown job type: {job_type}")
+    now = datetime.utcnow()
+    job = models.Job(
+        type=job_type,
+        payload=json.dumps(payload or {}),
+        priority=priority,
+        max_attempts=JOB_TYPES[job_type].max_attempts,
+        run_at=now + timedelta(seconds=delay),
+        created_date=now,
+    )
+    db.add(job)
+    if delay <= 0:
+        event.listen(getattr(db, "sync_session", db), "after_commit", _notify_after_commit, once=True)
+    return job
+
+def _notify_after_commit(session):
+    if pool is not None:
+        pool.notify()
+
+def _claimable(now: datetime):
+    job = models.Job
+    return or_(
+        and_(job.status == "queued", job.run_at <= now),
+        and_(job.status == "running", job.lease_until < now),
+    )
+
+def claim(types: list[str]):
+    # One UPDATE ... RETURNING picks the next job and takes its lease, so two
+    # workers can never both get it
+    job = models.Job
+    now = datetime.utcnow()
+    next_id = (
+        select(job.id)
+        .where(_claimable(now), job.type.in_(types))
+        .order_by(job.priority.desc(), job.run_at, job.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    with SessionLocal() as db:
+        row = db.execute(
+            update(job)
+            .where(job.id == next_id, _claimable(now))
+            .values(
+                status="running",
+                attempts=job.attempts + 1,
+                started_at=now,
+                lease_until=now + timedelta(seconds=JOB_LEASE_SECONDS),
+                locked_by=WORKER_ID,
+            )
+            .returning(job.id, job.type, job.payload, job.attempts, job.max_attempts, job.started_at)
+        ).first()
+        db.commit()
+    return row
+
+def run(claimed) -> bool:
+    job = models.Job
+    job_type = JOB_TYPES[claimed.type]
+    with SessionLocal() as db:
+        try:
+            job_type.handler(db, json.loads(claimed.payload or "{}"))
+        except Exception as exc:
+            db.rollback()
+            _failed(db, claimed, job_type, exc)
+            return False
+        now = datetime.utcnow()
+        db.execute(
+            update(job)
+            .where(job.id == claimed.id)
+            .values(status="done", finished_at=now, lease_until=None, last_error=None)
+        )
+        if job_type.coalesce:
+            db.execute(
+                update(job)
+                # Only jobs already due: one scheduled for later (e.g. a GC waiting
+                # out a grace period) asks for a run after that time
+                .where(
+                    job.type == claimed.type,
+                    job.status == "queued",
+                    job.created_date <= claimed.started_at,
+                    job.run_at <= claimed.started_at,
+                )
+                .values(status="done", started_at=claimed.started_at, finished_at=now)
+            )
+        db.commit()
+    return True
+
+def _failed(db: Session, claimed, job_type: JobType, exc: Exception):
+    job = models.Job
+    error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+    if claimed.attempts >= claimed.max_attempts:
+        logger.error("Job %s (%s) failed after %d attempts: %s", claimed.id, claimed.type, claimed.attempts, error)
+        values = {"status": "failed", "finished_at": datetime.utcnow()}
+    else:
+        # Exponential backoff with jitter so a failing dependency isn't hit in lockstep
+        delay = min(job_type.backoff * 2 ** (claimed.attempts - 1), JOB_MAX_BACKOFF) * random.uniform(0.8, 1.2)
+        logger.warning("Job %s (%s) attempt %d failed, retrying in %.0fs: %s",
+                       claimed.id, claimed.type, claimed.attempts, delay, error)
+        values = {"status": "queued", "run_at": datetime.utcnow() + timedelta(seconds=delay)}
+    db.execute(update(job).where(job.id == claimed.id).values(lease_until=None, last_error=error[:2000], **values))
+    db.commit()
+
+def purge_finished(older_than_days: int = JOB_RETENTION_DAYS) -> int:
+    job = models.Job
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    with SessionLocal() as db:
+        result = db.execute(delete(job).where(job.status.in_(["done", "failed"]), job.finished_at < cutoff))
+        db.commit()
+    return result.rowcount
+
+def _percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+def stats(db: Session) -> dict:
+    job = models.Job
+    queue = defaultdict(dict)
+    for job_type, status, count in db.execute(
+        select(job.type, job.status, func.count()).group_by(job.type, job.status)
+    ):
+        queue[job_type][status] = count
+    oldest = db.scalar(select(func.min(job.run_at)).where(job.status == "queued", job.run_at <= datetime.utcnow()))
+
+    # Wait is run_at -> started_at (time spent due but unclaimed), run is started_at -> finished_at
+    timings = defaultdict(lambda: {"wait": [], "run": []})
+    for job_type, run_at, started_at, finished_at in db.execute(
+        select(job.type, job.run_at, job.started_at, job.finished_at)
+        .where(job.status == "done", job.finished_at.is_not(None))
+        .order_by(job.finished_at.desc())
+        .limit(JOB_STATS_WINDOW)
+    ):
+        timings[job_type]["wait"].append(max((started_at - run_at).total_seconds(), 0) * 1000)
+        timings[job_type]["run"].append((finished_at - started_at).total_seconds() * 1000)
+    latency = {
+        job_type: {
+            "jobs": len(values["run"]),
+            "wait_ms_p50": _percentile(values["wait"], 0.5),
+            "wait_ms_p95": _percentile(values["wait"], 0.95),
+            "run_ms_p50": _percentile(values["run"], 0.5),
+            "run_ms_p95": _percentile(values["run"], 0.95),
+        }
+        for job_type, values in timings.items()
+    }
+    return {
+        "worker_id": WORKER_ID,
+        "workers": pool.workers if pool is not None else 0,
+        "running_here": dict(pool.running) if pool is not None else {},
+        "queue": dict(queue),
+        "oldest_due_age_s": None if oldest is None else round((datetime.utcnow() - oldest).total_seconds(), 3),
+        "latency": latency,
+        "types": {
+            name: {"concurrency": job_type.concurrency, "max_attempts": job_type.max_attempts}
+            for name, job_type in JOB_TYPES.items()
+        },
+    }
+
+class WorkerPool:
+    # Per-type concurrency limits apply within this process
+    def __init__(self, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.running = defaultdict(int)
+        self._tasks: list[asyncio.Task] = []
+        self._claim_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._loop = None
+        self._stopping = False
+        self._last_purge = 0.0
+
+    def notify(self):
+        # Safe from any thread; commits on the threadpool land here
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logger.info("Started %d job workers as %s", self.workers, WORKER_ID)
+
+    async def stop(self, timeout: float = JOB_SHUTDOWN_TIMEOUT):
+        # Jobs already running are given a moment to finish; anything cut off
+        # keeps its lease and is retried once that runs out
+        self._stopping = True
+        self._wake.set()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+        self._loop = None
+
+    async def _claim_next(self):
+        async with self._claim_lock:
+            types = [name for name, job_type in JOB_TYPES.items() if self.running[name] < job_type.concurrency]
+            if not types:
+                return None
+            claimed = await anyio.to_thread.run_sync(claim, types)
+            if claimed is not None:
+                self.running[claimed.type] += 1
+            return claimed
+
+    async def _idle(self):
+        if time.monotonic() - self._last_purge > 3600:
+            self._last_purge = time.monotonic()
+            await anyio.to_thread.run_sync(purge_finished)
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _work(self):
+        while not self._stopping:
+            try:
+                claimed = await self._claim_next()
+            except Exception:
+                logger.exception("Could not claim a job")
+                claimed = None
+            if claimed is None:
+                await self._idle()
+                continue
+            try:
+                await anyio.to_thread.run_sync(run, claimed)
+            except Exception:
+                logger.exception("Job %s (%s) could not be recorded", claimed.id, claimed.type)
+            finally:
+                self.running[claimed.type] -= 1
+                # A slot for this type just freed up
+                self._wake.set()
+
+pool: WorkerPool | None = None
+
+async def start_pool(workers: int = JOB_WORKERS):
+    global pool
+    if workers <= 0:
+        return
+    pool = WorkerPool(workers)
+    await pool.start()
+
+async def stop_pool():
+    global pool
+    if pool is not None:
+        await pool.stop()
+        pool = None
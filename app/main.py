@@ -1,14 +1,59 @@
-from fastapi import FastAPI
+from app.startup import FirstRequestTimer, report as startup_report
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app import models
-from app.database import engine
-from app.routes import auth, products, tutorials, services, cart, purchases, requests, media
+from app import events, invalidation, jobs, logs, metrics as request_metrics, migrations, search as catalog_search, storage
+from app import tasks  # registers the background job handlers
+from app.database import DB_QUERY_STATS, engine
+import logging
 import os
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Schema changes ship as migrations, run once per deploy (python -m app.migrations).
+# Workers only compare the schema version; DB_AUTO_MIGRATE=1 upgrades at startup for local runs
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "0") in ("1", "true", "True")
+MEDIA_DIR = "media"
+
+ROUTER_MODULES = [
+    "auth", "products", "tutorials", "services", "cart", "purchases",
+    "requests", "media", "admin", "search", "analytics", "metrics",
+]
+for name in ROUTER_MODULES:
+    startup_report.import_module(f"app.routes.{name}")
+from app.routes import auth, products, tutorials, services, cart, purchases, requests, media, admin, search, analytics, metrics
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logs.configure_logging()
+    with startup_report.step("migrations"):
+        if DB_AUTO_MIGRATE:
+            migrations.upgrade(engine)
+        elif migrations.current_version(engine) < migrations.HEAD:
+            logger.warning("Database schema is behind; run python -m app.migrations")
+    with startup_report.step("search index"):
+        catalog_search.detect_search_index(engine)
+    with startup_report.step("storage check"):
+        storage.check(engine)
+    os.makedirs(MEDIA_DIR, exist_ok=True)
+    with startup_report.step("job workers"):
+        await jobs.start_pool()
+    with startup_report.step("cache version watcher"):
+        await invalidation.watcher.start()
+    with startup_report.step("request event stream"):
+        await events.broker.start()
+    startup_report.ready()
+    yield
+    await events.broker.stop()
+    await invalidation.watcher.stop()
+    await jobs.stop_pool()
+    logs.shutdown_logging()
+
+app = FastAPI(
+    lifespan=lifespan,
+    # Lets the in-flight gauge pick up the route before the handler runs
+    dependencies=[Depends(request_metrics.attribute_route)] if request_metrics.METRICS_ENABLED else None,
+)
 
 # CORS configuration
 app.add_middleware(
@@ -17,12 +62,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-DB-Queries", "X-DB-Time", "X-Request-ID"],
 )
-
-# Create media directory if it doesn't exist
-MEDIA_DIR = "media"
-if not os.path.exists(MEDIA_DIR):
-    os.makedirs(MEDIA_DIR)
+if DB_QUERY_STATS:
+    app.add_middleware(request_metrics.QueryStatsMiddleware)
+if request_metrics.METRICS_ENABLED:
+    app.add_middleware(request_metrics.MetricsMiddleware)
+app.add_middleware(logs.RequestIdMiddleware)
+app.add_middleware(FirstRequestTimer)
 
 # Include routers
 app.include_router(auth.router, prefix="/api")
@@ -32,4 +79,11 @@ app.include_router(services.router, prefix="/api")
 app.include_router(cart.router, prefix="/api")
 app.include_router(purchases.router, prefix="/api")
 app.include_router(requests.router, prefix="/api")
-app.include_router(media.router, prefix="/api")
\ No newline at end of file
+app.include_router(media.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
+app.include_router(search.router, prefix="/api")
+app.include_router(analytics.router, prefix="/api")
+if request_metrics.METRICS_ENABLED:
+    app.include_router(metrics.router)
+
+startup_report.imported()
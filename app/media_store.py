@@ -0,0 +1,171 @@
+import argparse
+import json
+import mimetypes
+import os
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.orm import Session
+from app import models
+from app.crud import UPSERT_INSERTS
+from app.streaming import guess_media_type
+
+MEDIA_DIR = "media"
+BLOB_DIR = os.path.join(MEDIA_DIR, "blobs")
+TMP_DIR = os.path.join(MEDIA_DIR, ".tmp")
+# Unreferenced blobs and abandoned temp files are only removed once they are this old,
+# so an upload racing a collection has time to take its reference
+MEDIA_GC_GRACE_SECONDS = int(os.getenv("MEDIA_GC_GRACE_SECONDS", "3600"))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+def is_sha256(value: str) -> bool:
+    return _SHA256.fullmatch(value) is not None
+
+def blob_path(sha256: str) -> str:
+    # Two levels of 256-way sharding keep directories small at millions of blobs
+    return os.path.join(BLOB_DIR, sha256[:2], sha256[2:4], sha256)
+
+def blob_url(sha256: str) -> str:
+    return f"/api/media/blobs/{sha256}"
+
+def temp_path() -> str:
+    os.makedirs(TMP_DIR, exist_ok=True)
+    return os.path.join(TMP_DIR, uuid.uuid4().hex)
+
+def detect_media_type(name: str, path: str) -> str:
+    # Blob paths carry no extension, so go by the logical name before sniffing bytes
+    media_type, _ = mimetypes.guess_type(name)
+    return media_type or guess_media_type(path)
+
+def place_blob(tmp_path: str, sha256: str) -> bool:
+    # Moves a fully written temp file to its content address. Returns False when
+    # the content was already stored, in which case the temp copy is dropped.
+    # Call it only once the blob's row is retained in the current transaction
+    dest = blob_path(sha256)
+    if os.path.exists(dest):
+        os.remove(tmp_path)
+        return False
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    os.replace(tmp_path, dest)
+    return True
+
+def _retain(db: Session, sha256: str, size: int, media_type: str):
+    upsert = UPSERT_INSERTS[db.get_bind().dialect.name](models.MediaBlob).values(
+        sha256=sha256, size=size, media_type=media_type, refcount=1, created_date=datetime.utcnow()
+    )
+    db.execute(upsert.on_conflict_do_update(
+        index_elements=[models.MediaBlob.sha256],
+        set_={"refcount": models.MediaBlob.refcount + 1, "released_date": None},
+    ))
+
+def _release(db: Session, sha256: str):
+    blob = models.MediaBlob
+    db.execute(
+        update(blob)
+        .where(blob.sha256 == sha256)
+        .values(
+            refcount=blob.refcount - 1,
+            released_date=case((blob.refcount <= 1, datetime.utcnow()), else_=blob.released_date),
+        )
+    )
+
+def link(db: Session, name: str, sha256: str, size: int, media_type: str) -> models.MediaName:
+    # Points name at the blob and adjusts reference counts; the caller commits
+    media_name = db.get(models.MediaName, name)
+    if media_name is not None and media_name.sha256 == sha256:
+        return media_name
+    _retain(db, sha256, size, media_type)
+    if media_name is None:
+        media_name = models.MediaName(name=name, sha256=sha256)
+        db.add(media_name)
+    else:
+        _release(db, media_name.sha256)
+        media_name.sha256 = sha256
+        media_name.updated_date = datetime.utcnow()
+    return media_name
+
+def unlink(db: Session, name: str) -> bool:
+    media_name = db.get(models.MediaName, name)
+    if media_name is None:
+        return False
+    _release(db, media_name.sha256)
+    db.delete(media_name)
+    return True
+
+def resolve(db: Session, name: str) -> models.MediaBlob | None:
+    return db.scalar(
+        select(models.MediaBlob)
+        .join(models.MediaName, models.MediaName.sha256 == models.MediaBlob.sha256)
+        .where(models.MediaName.name == name)
+    )
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _old_files(root: str, cutoff: float):
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    yield path, filename
+            except FileNotFoundError:
+                continue
+
+def collect_garbage(db: Session, grace_seconds: int = MEDIA_GC_GRACE_SECONDS) -> dict:
+    report = {"blobs_removed": 0, "bytes_freed": 0, "orphan_files_removed": 0, "temp_files_removed": 0}
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    blob = models.MediaBlob
+    candidates = db.execute(
+        select(blob.sha256, blob.size).where(blob.refcount <= 0, blob.released_date < cutoff)
+    ).all()
+    for sha256, size in candidates:
+        # Re-check the count in the delete itself in case an upload just took a reference
+        deleted = db.execute(delete(blob).where(blob.sha256 == sha256, blob.refcount <= 0))
+        if deleted.rowcount:
+            # Removed before the commit, while the delete still holds the row: an
+            # upload retaining this blob waits for the commit, then sees the file
+            # is gone and places its own copy
+            _remove_quietly(blob_path(sha256))
+            report["blobs_removed"] += 1
+            report["bytes_freed"] += size or 0
+        db.commit()
+
+    file_cutoff = time.time() - grace_seconds
+    for path, _ in _old_files(TMP_DIR, file_cutoff):
+        _remove_quietly(path)
+        report["temp_files_removed"] += 1
+    # Files with no index row, e.g. left behind by a crash between placing and committing
+    known = set(db.scalars(select(blob.sha256)))
+    for path, filename in _old_files(BLOB_DIR, file_cutoff):
+        if filename not in known:
+            _remove_quietly(path)
+            report["orphan_files_removed"] += 1
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Garbage-collect unreferenced media blobs")
+    parser.add_argument("--grace-seconds", type=int, default=MEDIA_GC_GRACE_SECONDS)
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        report = collect_garbage(db, args.grace_seconds)
+    finally:
+        db.close()
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
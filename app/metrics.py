@@ -0,0 +1,219 @@
+import logging
+import os
+import re
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from fastapi import Request
+from app.database import QueryStats, query_stats
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") not in ("0", "false", "False")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+# Requests that match no route share one label, so scanners can't blow up the series count
+UNMATCHED_ROUTE = "unmatched"
+ATTRIBUTE_SCOPE_KEY = "metrics.attribute_route"
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # Per-bucket counts with a final +Inf slot; made cumulative at render time
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class RouteStats:
+    __slots__ = ("latency", "size", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.statuses = defaultdict(int)
+
+class Registry:
+    # Per-process: every update happens on the event loop thread, so plain dict
+    # and int updates are enough and no lock sits on the request path
+    def __init__(self):
+        self.routes: dict = {}
+        self.in_flight = defaultdict(int)
+        self.started_at = time.time()
+
+    def record(self, method: str, route: str, status: int, duration: float, size: int):
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        stats.latency.observe(duration)
+        stats.size.observe(size)
+        stats.statuses[status] += 1
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_total Requests completed, by route template and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route), stats in sorted(self.routes.items()):
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being handled; not yet routed ones count as unmatched.",
+            "# TYPE http_requests_in_flight gauge",
+        ]
+        for (method, route), count in sorted(self.in_flight.items()):
+            lines.append(f'http_requests_in_flight{{method="{method}",route="{_escape(route)}"}} {count}')
+        lines += _render_histogram(
+            "http_request_duration_seconds", "Time from request start to the end of the response body.",
+            ((key, stats.latency) for key, stats in sorted(self.routes.items())),
+        )
+        lines += _render_histogram(
+            "http_response_size_bytes", "Response body size.",
+            ((key, stats.size) for key, stats in sorted(self.routes.items())),
+        )
+        lines += [
+            "# HELP process_start_time_seconds Start time of this worker since the unix epoch.",
+            "# TYPE process_start_time_seconds gauge",
+            f"process_start_time_seconds {self.started_at}",
+        ]
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _render_histogram(name: str, help_text: str, series) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route), histogram in series:
+        labels = f'method="{method}",route="{_escape(route)}"'
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+registry = Registry()
+
+_suffix_patterns: dict = {}
+
+def route_template(scope) -> str:
+    # The matched route's path_format may be relative to the router it was
+    # declared on, so recover whatever prefix it was included under from the
+    # request path and keep the parameter placeholders from the route
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return UNMATCHED_ROUTE
+    pattern = _suffix_patterns.get(route.path_regex)
+    if pattern is None:
+        pattern = _suffix_patterns[route.path_regex] = re.compile(route.path_regex.pattern.lstrip("^"))
+    match = pattern.search(scope["path"])
+    if match is None:
+        return path_format
+    return scope["path"][:match.start()] + path_format
+
+class MetricsMiddleware:
+    # Pure ASGI so timing adds no extra task or response buffering per request
+    def __init__(self, app, registry: Registry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        response = {"status": 500, "size": 0, "content_length": None}
+
+        async def send_wrapper(message):
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                attribute()
+                response["status"] = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name.lower() == b"content-length":
+                        response["content_length"] = int(value)
+                        break
+            elif message_type == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        # In flight under a provisional label until routing has happened, then
+        # moved to the route template; see attribute_route
+        in_flight = self.registry.in_flight
+        label = [(method, UNMATCHED_ROUTE)]
+        in_flight[label[0]] += 1
+
+        def attribute():
+            if label[0][1] == UNMATCHED_ROUTE and scope.get("route") is not None:
+                in_flight[label[0]] -= 1
+                label[0] = (method, route_template(scope))
+                in_flight[label[0]] += 1
+
+        scope[ATTRIBUTE_SCOPE_KEY] = attribute
+
+        async def receive_wrapper():
+            # Request bodies are read after routing, before dependencies run
+            attribute()
+            return await receive()
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            attribute()
+            in_flight[label[0]] -= 1
+            # The router stores the matched route in the shared scope; its path
+            # template keeps ids out of the label
+            route_path = label[0][1]
+            # File responses sent via pathsend/zerocopysend carry no body bytes
+            size = response["content_length"] if response["content_length"] is not None else response["size"]
+            self.registry.record(method, route_path, response["status"], duration, size)
+
+def attribute_route(request: Request):
+    # App-wide dependency: moves the in-flight count to the matched route as
+    # soon as routing is done, before the handler runs
+    attribute = request.scope.get(ATTRIBUTE_SCOPE_KEY)
+    if attribute is not None:
+        attribute()
+
+class QueryStatsMiddleware:
+    # Adds X-DB-Queries / X-DB-Time for the queries run before the response
+    # started, and logs statements repeated often enough to look like an N+1
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+        token = query_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + [
+                    (b"x-db-queries", str(stats.count).encode()),
+                    (b"x-db-time", f"{stats.seconds * 1000:.2f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            query_stats.reset(token)
+            for statement, count in stats.repeated():
+                logger.warning(
+                    "Possible N+1: %s %s ran the same statement %d times: %s",
+                    scope["method"], route_template(scope), count, statement,
+                )
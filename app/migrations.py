@@ -0,0 +1,151 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, insert, select, text
+from sqlalchemy.exc import OperationalError
+from app import models, search
+
+logger = logging.getLogger(__name__)
+
+# How long an upgrade waits for another one that holds the lock
+MIGRATION_LOCK_TIMEOUT = float(os.getenv("MIGRATION_LOCK_TIMEOUT", "300"))
+# pg_advisory_xact_lock key; any constant no other code uses
+MIGRATION_LOCK_KEY = 0x6D696772
+
+# Kept off models.Base so create_all in the baseline never touches it
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# The tables as they stood when migrations were introduced. Later tables get
+# their own step, so a fresh database goes through the same steps as an old one
+BASELINE_TABLES = [
+    "users", "products", "tutorials", "services", "cart_items", "purchases",
+    "requests", "uploads", "sales_rollups", "rollup_watermarks",
+]
+
+def _baseline(connection):
+    # Creates whichever baseline tables are missing, so it is safe on databases
+    # that predate the migrations table
+    tables = [models.Base.metadata.tables[name] for name in BASELINE_TABLES]
+    models.Base.metadata.create_all(bind=connection, tables=tables)
+
+def _indexes(connection):
+    models.ensure_indexes(connection, BASELINE_TABLES)
+
+# Append only: each step runs once per database, in order, on the connection
+# holding the migration lock. A step that adds a table should create just that
+# table (Model.__table__.create(connection, checkfirst=True))
+def _media_store(connection):
+    models.MediaBlob.__table__.create(connection, checkfirst=True)
+    models.MediaName.__table__.create(connection, checkfirst=True)
+
+def _jobs(connection):
+    models.Job.__table__.create(connection, checkfirst=True)
+
+def _cache_versions(connection):
+    models.CacheVersion.__table__.create(connection, checkfirst=True)
+
+def _request_events(connection):
+    models.RequestEvent.__table__.create(connection, checkfirst=True)
+
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "catalog, cart and purchase indexes", _indexes),
+    (3, "catalog full-text search index", search.ensure_search_index),
+    (4, "content-addressed media store", _media_store),
+    (5, "background job queue", _jobs),
+    (6, "cross-worker cache invalidation versions", _cache_versions),
+    (7, "request events for the SSE stream", _request_events),
+]
+HEAD = MIGRATIONS[-1][0]
+
+def _version(connection) -> int:
+    if not inspect(connection).has_table(schema_migrations.name):
+        return 0
+    return connection.execute(select(func.max(schema_migrations.c.version))).scalar() or 0
+
+def current_version(engine) -> int:
+    with engine.connect() as connection:
+        return _version(connection)
+
+def pending(engine) -> list[tuple]:
+    version = current_version(engine)
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+@contextmanager
+def _locked(engine, timeout: float = MIGRATION_LOCK_TIMEOUT):
+    # One transaction holding the database's write lock, so concurrent upgrades
+    # queue up behind each other instead of applying the same steps twice
+    if engine.dialect.name == "sqlite":
+        # pysqlite only opens transactions before DML; with the driver in
+        # autocommit the BEGIN IMMEDIATE below is the transaction, DDL included
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    connection.exec_driver_sql("BEGIN IMMEDIATE")
+                    break
+                except OperationalError as exc:
+                    # busy_timeout already waited; keep waiting out a long migration elsewhere
+                    if "locked" not in str(exc.orig) or time.monotonic() > deadline:
+                        raise
+            try:
+                yield connection
+            except BaseException:
+                connection.exec_driver_sql("ROLLBACK")
+                raise
+            connection.exec_driver_sql("COMMIT")
+    else:
+        with engine.begin() as connection:
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            yield connection
+
+def upgrade(engine) -> list[int]:
+    # Every pending step and its schema_migrations row commit together; the
+    # version is read again under the lock, so a concurrent run that got there
+    # first leaves nothing to do
+    applied = []
+    with _locked(engine) as connection:
+        migration_metadata.create_all(bind=connection)
+        version = _version(connection)
+        for migration_version, name, step in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            logger.info("Applying migration %d: %s", migration_version, name)
+            step(connection)
+            connection.execute(
+                insert(schema_migrations).values(version=migration_version, name=name, applied_at=datetime.utcnow())
+            )
+            applied.append(migration_version)
+    return applied
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply or inspect database schema migrations")
+    parser.add_argument("command", choices=["upgrade", "status"], nargs="?", default="upgrade")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    from app.database import engine
+
+    if args.command == "status":
+        version = current_version(engine)
+        print(f"database at version {version}, head is {HEAD}")
+        for migration_version, name, _ in MIGRATIONS:
+            print(f"  {'applied' if migration_version <= version else 'pending'}  {migration_version}  {name}")
+        return 0 if version >= HEAD else 1
+    applied = upgrade(engine)
+    print(f"applied {len(applied)} migration(s); database at version {HEAD}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, DateTime, Boolean, Index, inspect, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -23,6 +23,11 @@ class Product(Base):
     description = Column(String)
     image = Column(String, nullable=True)
     posted_date = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        Index("ix_products_posted_date_id", "posted_date", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_type_posted_date_id", "type", "posted_date", "id"),
+    )
 
 class Tutorial(Base):
     __tablename__ = "tutorials"
@@ -34,6 +39,11 @@ class Tutorial(Base):
     posted_date = Column(DateTime, default=datetime.utcnow)
     video_url = Column(String, nullable=True)
     video_file = Column(String, nullable=True)
+    __table_args__ = (
+        Index("ix_tutorials_posted_date_id", "posted_date", "id"),
+        Index("ix_tutorials_price_id", "price", "id"),
+        Index("ix_tutorials_tutorial_type_posted_date_id", "tutorial_type", "posted_date", "id"),
+    )
 
 class Service(Base):
     __tablename__ = "services"
@@ -46,6 +56,14 @@ class Service(Base):
     posted_date = Column(DateTime, default=datetime.utcnow)
     video_url = Column(String, nullable=True)
     video_file = Column(String, nullable=True)
+    __table_args__ = (
+        Index("ix_services_posted_date_id", "posted_date", "id"),
+        Index("ix_services_price_id", "price", "id"),
+        Index("ix_services_category_posted_date_id", "category", "posted_date", "id"),
+    )
+
+# item_type values used by cart lines and purchases
+CATALOG_MODELS = {"product": Product, "tutorial": Tutorial, "service": Service}
 
 class CartItem(Base):
     __tablename__ = "cart_items"
@@ -55,6 +73,9 @@ class CartItem(Base):
     item_type = Column(String)  # "product", "tutorial", "service"
     quantity = Column(Integer, default=1)
     user = relationship("User", back_populates="cart_items")
+    __table_args__ = (
+        Index("uq_cart_items_user_id_item_type_item_id", "user_id", "item_type", "item_id", unique=True),
+    )
 
 class Purchase(Base):
     __tablename__ = "purchases"
@@ -64,7 +85,7 @@ class Purchase(Base):
     item_type = Column(String)
     quantity = Column(Integer)
     total_price = Column(Float)  # Added to store total price
-    purchase_date = Column(DateTime, default=datetime.utcnow)
+    purchase_date = Column(DateTime, default=datetime.utcnow, index=True)
     user = relationship("User", back_populates="purchases")
 
 class Request(Base):
@@ -74,5 +95,110 @@ class Request(Base):
     title = Column(String)
     description = Column(String)
     status = Column(String, default="pending")
-    posted_date = Column(DateTime, default=datetime.utcnow)
-    user = relationship("User", back_populates="requests")
\ No newline at end of file
+    posted_date = Column(DateTime, default=datetime.utcnow, index=True)
+    user = relationship("User", back_populates="requests")
+
+class Upload(Base):
+    __tablename__ = "uploads"
+    id = Column(String, primary_key=True, index=True)
+    filename = Column(String)
+    size = Column(Integer)
+    sha256 = Column(String, nullable=True)
+    completed = Column(Boolean, default=False)
+    created_date = Column(DateTime, default=datetime.utcnow)
+
+class MediaBlob(Base):
+    # One row per distinct file content; the file lives at its hash-derived path
+    __tablename__ = "media_blobs"
+    sha256 = Column(String, primary_key=True)
+    size = Column(Integer)
+    media_type = Column(String)
+    refcount = Column(Integer, default=0)
+    created_date = Column(DateTime, default=datetime.utcnow)
+    # Set when refcount drops to zero; garbage collection waits out a grace period from here
+    released_date = Column(DateTime, nullable=True, index=True)
+
+class MediaName(Base):
+    # Logical file name -> content; re-uploading a name repoints it to the new blob
+    __tablename__ = "media_names"
+    name = Column(String, primary_key=True)
+    sha256 = Column(String, ForeignKey("media_blobs.sha256"), index=True)
+    updated_date = Column(DateTime, default=datetime.utcnow)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String, nullable=False)
+    payload = Column(String, default="{}")  # JSON
+    priority = Column(Integer, default=0)  # higher runs first
+    status = Column(String, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    run_at = Column(DateTime, default=datetime.utcnow)
+    lease_until = Column(DateTime, nullable=True)
+    locked_by = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_date = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    __table_args__ = (
+        Index("ix_jobs_status_priority_run_at", "status", "priority", "run_at"),
+        Index("ix_jobs_finished_at", "finished_at"),
+    )
+
+class SalesRollup(Base):
+    __tablename__ = "sales_rollups"
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, index=True)
+    item_type = Column(String)
+    item_id = Column(Integer)
+    quantity = Column(Integer, default=0)
+    revenue = Column(Float, default=0.0)
+    orders = Column(Integer, default=0)
+    __table_args__ = (
+        Index("uq_sales_rollups_day_item_type_item_id", "day", "item_type", "item_id", unique=True),
+    )
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class RequestEvent(Base):
+    # Request changes for the SSE stream, shared by every worker; pruned after a while
+    __tablename__ = "request_events"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    type = Column(String, nullable=False)
+    data = Column(String, nullable=False)  # JSON
+    created_date = Column(DateTime, default=datetime.utcnow, index=True)
+
+class CacheVersion(Base):
+    # One row per "<cache>:<namespace>"; bumped by writes so other workers drop their copies
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+def _merge_duplicate_cart_items(connection):
+    # Older databases may hold several lines for one item; fold them into the oldest
+    connection.execute(text("""
+        UPDATE cart_items SET quantity = (
+            SELECT SUM(c.quantity) FROM cart_items c
+            WHERE c.user_id = cart_items.user_id AND c.item_type = cart_items.item_type AND c.item_id = cart_items.item_id
+        )
+        WHERE id IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, item_type, item_id HAVING COUNT(*) > 1)
+    """))
+    connection.execute(text("""
+        DELETE FROM cart_items WHERE id NOT IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, item_type, item_id)
+    """))
+
+def ensure_indexes(connection, tables: list[str]):
+    # create_all only creates indexes together with new tables
+    existing = {index["name"] for index in inspect(connection).get_indexes(CartItem.__tablename__)}
+    if "uq_cart_items_user_id_item_type_item_id" not in existing:
+        _merge_duplicate_cart_items(connection)
+    for name in tables:
+        for index in Base.metadata.tables[name].indexes:
+            index.create(connection, checkfirst=True)
@@ -0,0 +1,97 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from enum import Enum
+from sqlalchemy import tuple_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+class InvalidCursor(ValueError):
+    pass
+
+class SortOption(str, Enum):
+    newest = "newest"
+    oldest = "oldest"
+    price_asc = "price_asc"
+    price_desc = "price_desc"
+
+# sort option -> (column name, descending); ties are always broken on id
+SORT_KEYS = {
+    SortOption.newest: ("posted_date", True),
+    SortOption.oldest: ("posted_date", False),
+    SortOption.price_asc: ("price", False),
+    SortOption.price_desc: ("price", True),
+}
+
+def encode_cursor(sort: SortOption, value, item_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps({"s": sort.value, "v": value, "id": item_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: SortOption):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        if data["s"] != sort.value:
+            raise InvalidCursor("Cursor does not match sort order")
+        column_name, _ = SORT_KEYS[sort]
+        if column_name == "posted_date":
+            value = datetime.fromisoformat(data["v"])
+        else:
+            value = float(data["v"])
+        return value, int(data["id"])
+    except InvalidCursor:
+        raise
+    except (binascii.Error, KeyError, TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor("Invalid cursor") from exc
+
+def filter_price(query, model, min_price: float | None, max_price: float | None):
+    if min_price is not None:
+        query = query.filter(model.price >= min_price)
+    if max_price is not None:
+        query = query.filter(model.price <= max_price)
+    return query
+
+def _keyset(query, model, sort: SortOption, cursor: str | None, limit: int):
+    # Works on both legacy Query objects and 2.0-style select() statements
+    column_name, descending = SORT_KEYS[sort]
+    column = getattr(model, column_name)
+    key = tuple_(column, model.id)
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        if descending:
+            query = query.filter(key < tuple_(value, last_id))
+        else:
+            query = query.filter(key > tuple_(value, last_id))
+    if descending:
+        query = query.order_by(column.desc(), model.id.desc())
+    else:
+        query = query.order_by(column.asc(), model.id.asc())
+
+    # Fetch one extra row to learn whether another page exists
+    return query.limit(limit + 1)
+
+def _page(rows, sort: SortOption, limit: int):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        column_name, _ = SORT_KEYS[sort]
+        next_cursor = encode_cursor(sort, getattr(last, column_name), last.id)
+    return rows, next_cursor
+
+def paginate(query, model, sort: SortOption, cursor: str | None, limit: int):
+    rows = _keyset(query, model, sort, cursor, limit).all()
+    return _page(rows, sort, limit)
+
+async def paginate_async(db, stmt, model, sort: SortOption, cursor: str | None, limit: int, as_rows: bool = False):
+    # as_rows returns the selected columns as Row tuples instead of ORM objects
+    stmt = _keyset(stmt, model, sort, cursor, limit)
+    if as_rows:
+        rows = (await db.execute(stmt)).all()
+    else:
+        rows = (await db.scalars(stmt)).all()
+    return _page(list(rows), sort, limit)
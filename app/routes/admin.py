@@ -0,0 +1,110 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Literal, Optional
+from app import auth, catalog_import, export, invalidation, jobs, logs, media_store, models, startup
+from app.cache import catalog_cache
+from app.database import get_db
+from app.hashing import hash_pool
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+@router.get("/cache")
+def read_cache_stats(current_user: auth.Principal = Depends(auth.get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {
+        "catalog": catalog_cache.stats(),
+        "tokens": auth.token_cache.stats(),
+        "principals": auth.principal_cache.stats(),
+        "sync": invalidation.watcher.stats(),
+    }
+
+@router.get("/hashing")
+def read_hashing_stats(current_user: auth.Principal = Depends(auth.get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return hash_pool.stats()
+
+@router.get("/logging")
+def read_logging_stats(current_user: auth.Principal = Depends(auth.get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return logs.stats()
+
+@router.get("/startup")
+def read_startup_report(current_user: auth.Principal = Depends(auth.get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return startup.report.as_dict()
+
+@router.get("/jobs")
+def read_job_stats(db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return jobs.stats(db)
+
+@router.post("/media/gc")
+def collect_media_garbage(
+    grace_seconds: int = Query(media_store.MEDIA_GC_GRACE_SECONDS, ge=0),
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return media_store.collect_garbage(db, grace_seconds)
+
+@router.post("/import/{item_type}")
+def import_catalog(
+    item_type: Literal["product", "service", "tutorial"],
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    batch_size: int = Query(catalog_import.DEFAULT_BATCH_SIZE, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    fmt = format or catalog_import.detect_format(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Unknown file format, pass ?format=csv or ?format=ndjson")
+    # The upload is spooled to disk by the multipart parser; read it back line by line
+    lines = catalog_import.decode_lines(file.file)
+    return catalog_import.import_and_publish(db, item_type, lines, fmt, batch_size)
+
+def _export_response(name: str, model, date_column, start: Optional[datetime], end: Optional[datetime], fmt: str):
+    stmt = select(*model.__table__.columns)
+    if start is not None:
+        stmt = stmt.where(date_column >= start)
+    if end is not None:
+        stmt = stmt.where(date_column < end)
+    stmt = stmt.order_by(model.id)
+    return StreamingResponse(
+        export.stream_rows(stmt, fmt),
+        media_type=export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+@router.get("/export/purchases")
+def export_purchases(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return _export_response("purchases", models.Purchase, models.Purchase.purchase_date, start, end, format)
+
+@router.get("/export/requests")
+def export_requests(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return _export_response("requests", models.Request, models.Request.posted_date, start, end, format)
\ No newline at end of file
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import Literal, Optional
+from app import analytics, auth
+from app.database import get_db
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+@router.get("/sales")
+def read_sales(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: Literal["day", "week", "month"] = "day",
+    group_by: Literal["total", "item_type", "item"] = "total",
+    top: int = Query(10, ge=0, le=100),
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    # Read only: purchases are folded in by the sales_rollup job, or POST /sales/compact
+    return analytics.sales_report(db, start, end, bucket, group_by, top)
+
+@router.post("/sales/compact")
+def compact_sales(db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {"compacted": analytics.compact_sales(db)}
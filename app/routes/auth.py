@@ -1,21 +1,43 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from datetime import timedelta
+from sqlalchemy import select
+from datetime import datetime, timedelta
 from app import models, schemas, auth
-from app.database import get_db
+from app.database import get_session
+from app.hashing import HashPoolBusy
 
 router = APIRouter()
 
+def _hashing_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+def _token_response(username: str, refresh_expires_at: datetime | None = None) -> dict:
+    access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = auth.create_access_token(
+        data={"sub": username}, expires_delta=access_token_expires
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": auth.create_refresh_token(username, refresh_expires_at),
+    }
+
 @router.post("/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+async def register_user(user: schemas.UserCreate, db=Depends(get_session)):
+    db_user = await db.scalar(select(models.User).filter(models.User.username == user.username))
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    db_email = db.query(models.User).filter(models.User.email == user.email).first()
+    db_email = await db.scalar(select(models.User).filter(models.User.email == user.email))
     if db_email:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = auth.get_password_hash(user.password)
+    try:
+        hashed_password = await auth.get_password_hash_async(user.password)
+    except HashPoolBusy:
+        raise _hashing_busy()
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -23,21 +45,33 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         is_admin=user.username == "admin"
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/login", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_session)):
+    user = await db.scalar(select(models.User).filter(models.User.username == form_data.username))
+    try:
+        valid = user is not None and await auth.verify_password_async(form_data.password, user.hashed_password)
+    except HashPoolBusy:
+        raise _hashing_busy()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=30)
-    access_token = auth.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    return _token_response(user.username)
+
+@router.post("/token/refresh", response_model=schemas.Token)
+async def refresh_access_token(token: schemas.TokenRefresh, db=Depends(get_session)):
+    refresh = auth.verify_refresh_token(token.refresh_token)
+    if refresh is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    principal = await auth.resolve_principal(db, refresh["username"])
+    return _token_response(principal.username, refresh["expires_at"])
\ No newline at end of file
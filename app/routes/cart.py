@@ -1,116 +1,221 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app import models, schemas, auth
-from app.database import get_db
+from sqlalchemy import delete, select
+from typing import List, Literal, Optional, Union
+from collections import defaultdict
+from datetime import datetime
+from app import crud, jobs, models, schemas, auth
+from app.database import get_session
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
+async def _fetch_catalog_items(db, cart_items) -> dict:
+    # One IN query per item type, however many lines the cart has
+    ids_by_type = defaultdict(set)
+    for cart_item in cart_items:
+        ids_by_type[cart_item.item_type].add(cart_item.item_id)
+    catalog_items = {}
+    for item_type, item_ids in ids_by_type.items():
+        model = models.CATALOG_MODELS.get(item_type)
+        if model is None:
+            continue
+        for item in await db.scalars(select(model).filter(model.id.in_(item_ids))):
+            catalog_items[(item_type, item.id)] = item
+    return catalog_items
+
+def _item_summary(item) -> dict:
+    return {
+        "id": item.id,
+        "name": item.title if isinstance(item, models.Tutorial) else item.name,
+        "price": item.price,
+        "image": getattr(item, "image", None),
+    }
+
 @router.post("/", response_model=schemas.CartItem, status_code=status.HTTP_201_CREATED)
-def add_to_cart(
+async def add_to_cart(
     cart_item: schemas.CartItemCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db=Depends(get_session),
+    current_user: auth.Principal = Depends(auth.get_current_user)
 ):
-    logger.info(f"Adding to cart for user {current_user.id}: {cart_item.dict()}")
-    # Validate item existence
-    if cart_item.item_type == "tutorial":
-        item = db.query(models.Tutorial).filter(models.Tutorial.id == cart_item.item_id).first()
-    elif cart_item.item_type == "service":
-        item = db.query(models.Service).filter(models.Service.id == cart_item.item_id).first()
-    elif cart_item.item_type == "product":
-        item = db.query(models.Product).filter(models.Product.id == cart_item.item_id).first()
-    else:
-        logger.error(f"Invalid item_type: {cart_item.item_type}")
+    logger.info("Adding to cart", extra={"user_id": current_user.id, "item_type": cart_item.item_type, "item_id": cart_item.item_id, "quantity": cart_item.quantity})
+    if cart_item.item_type not in models.CATALOG_MODELS:
+        logger.error("Invalid item_type %s", cart_item.item_type)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid item_type")
+    if cart_item.quantity <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be positive")
 
-    if not item:
-        logger.error(f"Item not found: {cart_item.item_type} ID {cart_item.item_id}")
+    db_cart_item = await crud.add_cart_item_async(
+        db, current_user.id, cart_item.item_type, cart_item.item_id, cart_item.quantity
+    )
+    if not db_cart_item:
+        logger.error("Item not found: %s ID %s", cart_item.item_type, cart_item.item_id)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
 
-    # Check if item already exists in cart
-    existing_item = db.query(models.CartItem).filter(
-        models.CartItem.user_id == current_user.id,
-        models.CartItem.item_type == cart_item.item_type,
-        models.CartItem.item_id == cart_item.item_id
-    ).first()
-
-    if existing_item:
-        existing_item.quantity += cart_item.quantity
-        db.commit()
-        db.refresh(existing_item)
-        logger.info(f"Updated existing cart item: {existing_item.id}")
-        return existing_item
-
-    # Create new cart item
-    db_cart_item = models.CartItem(
-        user_id=current_user.id,
-        item_type=cart_item.item_type,
-        item_id=cart_item.item_id,
-        quantity=cart_item.quantity
+    result = schemas.CartItem.model_validate(db_cart_item)
+    await db.commit()
+    logger.info("Upserted cart item %s", result.id, extra={"cart_item_id": result.id})
+    return result
+
+@router.post("/batch", response_model=List[schemas.CartItem], status_code=status.HTTP_201_CREATED)
+async def add_many_to_cart(
+    batch: schemas.CartItemBatch,
+    db=Depends(get_session),
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    logger.info("Adding %d items to cart", len(batch.items), extra={"user_id": current_user.id})
+    if not batch.items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No items given")
+    quantities = defaultdict(int)
+    for cart_item in batch.items:
+        if cart_item.item_type not in models.CATALOG_MODELS:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid item_type")
+        if cart_item.quantity <= 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be positive")
+        quantities[(cart_item.item_type, cart_item.item_id)] += cart_item.quantity
+
+    catalog_items = await _fetch_catalog_items(db, batch.items)
+    missing = [key for key in quantities if key not in catalog_items]
+    if missing:
+        logger.error("Items not found: %s", missing)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"message": "Item not found", "items": [{"item_type": t, "item_id": i} for t, i in missing]},
+        )
+
+    db_cart_items = await crud.add_cart_items_async(
+        db, current_user.id, [(item_type, item_id, quantity) for (item_type, item_id), quantity in quantities.items()]
     )
-    db.add(db_cart_item)
-    db.commit()
-    db.refresh(db_cart_item)
-    logger.info(f"Created new cart item: {db_cart_item.id}")
-    return db_cart_item
+    result = [schemas.CartItem.model_validate(item) for item in db_cart_items]
+    await db.commit()
+    return result
+
+@router.post("/checkout", response_model=schemas.Checkout, status_code=status.HTTP_201_CREATED)
+async def checkout(
+    db=Depends(get_session),
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    logger.info("Checking out cart", extra={"user_id": current_user.id})
+    # Take the lines out of the cart first and price exactly what was removed.
+    # The delete opens the write transaction, so a concurrent checkout or
+    # quantity change lands wholly before or after this one
+    cart = models.CartItem
+    cart_items = (await db.execute(
+        delete(cart)
+        .where(cart.user_id == current_user.id)
+        .returning(cart.id, cart.item_type, cart.item_id, cart.quantity)
+    )).all()
+    if not cart_items:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty")
+
+    catalog_items = await _fetch_catalog_items(db, cart_items)
+    missing = [item for item in cart_items if (item.item_type, item.item_id) not in catalog_items]
+    if missing:
+        # Puts the lines back
+        await db.rollback()
+        logger.error("Checkout has unavailable items", extra={"user_id": current_user.id, "cart_item_ids": [item.id for item in missing]})
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Some cart items are no longer available", "cart_item_ids": [item.id for item in missing]},
+        )
 
-@router.get("/", response_model=List[schemas.CartItem])
-def read_cart(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    purchase_date = datetime.utcnow()
+    purchases = [
+        models.Purchase(
+            user_id=current_user.id,
+            item_id=item.item_id,
+            item_type=item.item_type,
+            quantity=item.quantity,
+            total_price=round(catalog_items[(item.item_type, item.item_id)].price * item.quantity, 2),
+            purchase_date=purchase_date,
+        )
+        for item in cart_items
+    ]
+    db.add_all(purchases)
+    await db.flush()
+
+    # Serialize before commit so the sync session does not reload every row afterwards
+    result = schemas.Checkout(
+        purchases=[schemas.Purchase.model_validate(purchase) for purchase in purchases],
+        total_price=round(sum(purchase.total_price for purchase in purchases), 2),
+    )
+    jobs.enqueue(db, "sales_rollup")
+    await db.commit()
+    logger.info("Checked out %d items", len(purchases), extra={"user_id": current_user.id})
+    return result
+
+@router.get("/", response_model=Union[List[schemas.CartItem], schemas.CartView])
+async def read_cart(
+    expand: Optional[Literal["items"]] = None,
+    db=Depends(get_session),
+    current_user: auth.Principal = Depends(auth.get_current_user)
 ):
-    logger.info(f"Fetching cart for user: {current_user.id}")
-    return db.query(models.CartItem).filter(models.CartItem.user_id == current_user.id).all()
+    logger.info("Fetching cart", extra={"user_id": current_user.id})
+    cart_items = (await db.scalars(select(models.CartItem).filter(models.CartItem.user_id == current_user.id))).all()
+    if expand is None:
+        return cart_items
+
+    catalog_items = await _fetch_catalog_items(db, cart_items)
+    lines = []
+    for cart_item in cart_items:
+        item = catalog_items.get((cart_item.item_type, cart_item.item_id))
+        lines.append({
+            "id": cart_item.id,
+            "user_id": cart_item.user_id,
+            "item_id": cart_item.item_id,
+            "item_type": cart_item.item_type,
+            "quantity": cart_item.quantity,
+            "item": _item_summary(item) if item else None,
+            "line_total": round(item.price * cart_item.quantity, 2) if item else 0.0,
+        })
+    return {"items": lines, "subtotal": round(sum(line["line_total"] for line in lines), 2)}
 
 @router.patch("/{cart_item_id}", response_model=schemas.CartItem)
-def update_cart_item(
+async def update_cart_item(
     cart_item_id: int,
     update_data: schemas.CartItemUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db=Depends(get_session),
+    current_user: auth.Principal = Depends(auth.get_current_user)
 ):
-    logger.info(f"Updating cart item {cart_item_id} with quantity {update_data.quantity} for user {current_user.id}")
-    db_cart_item = db.query(models.CartItem).filter(
+    logger.info("Updating cart item %s", cart_item_id, extra={"user_id": current_user.id, "quantity": update_data.quantity})
+    db_cart_item = await db.scalar(select(models.CartItem).filter(
         models.CartItem.id == cart_item_id,
         models.CartItem.user_id == current_user.id
-    ).first()
+    ))
 
     if not db_cart_item:
-        logger.error(f"Cart item {cart_item_id} not found for user {current_user.id}")
+        logger.error("Cart item %s not found", cart_item_id, extra={"user_id": current_user.id})
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
 
     if update_data.quantity <= 0:
-        logger.error(f"Invalid quantity {update_data.quantity} for cart item {cart_item_id}")
+        logger.error("Invalid quantity %s for cart item %s", update_data.quantity, cart_item_id)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be positive")
 
     db_cart_item.quantity = update_data.quantity
-    db.commit()
-    db.refresh(db_cart_item)
-    logger.info(f"Updated cart item {cart_item_id} to quantity {db_cart_item.quantity}")
+    await db.commit()
+    await db.refresh(db_cart_item)
+    logger.info("Updated cart item %s to quantity %s", cart_item_id, db_cart_item.quantity)
     return db_cart_item
 
 @router.delete("/{cart_item_id}")
-def remove_from_cart(
+async def remove_from_cart(
     cart_item_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db=Depends(get_session),
+    current_user: auth.Principal = Depends(auth.get_current_user)
 ):
-    logger.info(f"Removing cart item {cart_item_id} for user {current_user.id}")
-    db_cart_item = db.query(models.CartItem).filter(
+    logger.info("Removing cart item %s", cart_item_id, extra={"user_id": current_user.id})
+    db_cart_item = await db.scalar(select(models.CartItem).filter(
         models.CartItem.id == cart_item_id,
         models.CartItem.user_id == current_user.id
-    ).first()
+    ))
 
     if not db_cart_item:
-        logger.error(f"Cart item {cart_item_id} not found for user {current_user.id}")
+        logger.error("Cart item %s not found", cart_item_id, extra={"user_id": current_user.id})
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
 
-    db.delete(db_cart_item)
-    db.commit()
-    logger.info(f"Removed cart item {cart_item_id}")
+    await db.delete(db_cart_item)
+    await db.commit()
+    logger.info("Removed cart item %s", cart_item_id)
     return {"detail": "Cart item removed"}
\ No newline at end of file
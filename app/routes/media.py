@@ -1,23 +1,197 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, File, Header, UploadFile, HTTPException, Request, status
+from fastapi.routing import APIRoute
+from sqlalchemy.orm import Session
+from app import jobs, media_store, models, schemas, auth, uploads
+from app.database import get_db
+from app.streaming import media_file_response
+import anyio
 import os
-import shutil
+import uuid
 
 router = APIRouter()
 
-MEDIA_DIR = "media"
+MEDIA_DIR = media_store.MEDIA_DIR
+UPLOAD_DIR = os.path.join(MEDIA_DIR, ".uploads")
+# Room for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
 
-@router.post("/upload-video/", response_model=dict)
-async def upload_video(file: UploadFile = File(...)):
-    file_path = os.path.join(MEDIA_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    return {"filename": file.filename, "path": file_path}
+class SizeLimitedRoute(APIRoute):
+    # Multipart bodies are spooled to disk before the handler runs, so a body
+    # declared too large is refused up front. Chunked bodies without a
+    # Content-Length are still cut off by save_upload
+    def get_route_handler(self):
+        handler = super().get_route_handler()
 
-@router.get("/media/{filename}")
-async def get_video(filename: str):
+        async def limited_handler(request: Request):
+            try:
+                declared = int(request.headers.get("content-length", ""))
+            except ValueError:
+                declared = None
+            if declared is not None and declared > uploads.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+            return await handler(request)
+
+        return limited_handler
+
+def _upload_status(db_upload: models.Upload) -> dict:
+    if db_upload.completed:
+        offset = db_upload.size
+    else:
+        offset = uploads.current_offset(os.path.join(UPLOAD_DIR, db_upload.id))
+    return {
+        "id": db_upload.id,
+        "filename": db_upload.filename,
+        "size": db_upload.size,
+        "offset": offset,
+        "completed": db_upload.completed,
+        "sha256": db_upload.sha256,
+    }
+
+def _store(db: Session, name: str, tmp_path: str, size: int, sha256: str) -> dict:
+    # Runs on a worker thread: moves the bytes to their content address and repoints the name
+    media_type = media_store.detect_media_type(name, tmp_path)
+    # Take the reference before looking for the file: a collection that already
+    # deleted the row has removed the file too, and one that hasn't now waits
+    # for this commit and then finds the blob referenced
+    media_store.link(db, name, sha256, size, media_type)
+    db.flush()
+    stored = media_store.place_blob(tmp_path, sha256)
+    db.commit()
+    return {
+        "filename": name,
+        "path": media_store.blob_path(sha256),
+        "url": media_store.blob_url(sha256),
+        "size": size,
+        "sha256": sha256,
+        "deduplicated": not stored,
+    }
+
+async def upload_video(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    filename = os.path.basename(file.filename or "")
+    if not filename:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    tmp_path = await anyio.to_thread.run_sync(media_store.temp_path)
+    try:
+        size, sha256 = await uploads.save_upload(file, tmp_path)
+    except uploads.UploadTooLarge:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+    return await anyio.to_thread.run_sync(_store, db, filename, tmp_path, size, sha256)
+
+router.add_api_route("/upload-video/", upload_video, methods=["POST"], response_model=dict, route_class_override=SizeLimitedRoute)
+
+@router.post("/uploads/", response_model=schemas.Upload, status_code=status.HTTP_201_CREATED)
+def create_upload(upload: schemas.UploadCreate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    filename = os.path.basename(upload.filename)
+    if not filename:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    if upload.size <= 0:
+        raise HTTPException(status_code=400, detail="Size must be positive")
+    if upload.size > uploads.MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+    db_upload = models.Upload(id=uuid.uuid4().hex, filename=filename, size=upload.size)
+    uploads.create_part_file(os.path.join(UPLOAD_DIR, db_upload.id))
+    db.add(db_upload)
+    db.commit()
+    db.refresh(db_upload)
+    return _upload_status(db_upload)
+
+@router.get("/uploads/{upload_id}", response_model=schemas.Upload)
+def read_upload(upload_id: str, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    db_upload = db.query(models.Upload).filter(models.Upload.id == upload_id).first()
+    if not db_upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return _upload_status(db_upload)
+
+@router.patch("/uploads/{upload_id}", response_model=schemas.Upload)
+async def append_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    db_upload = await anyio.to_thread.run_sync(db.get, models.Upload, upload_id)
+    if not db_upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if db_upload.completed:
+        raise HTTPException(status_code=409, detail="Upload already completed")
+
+    complete_path = os.path.join(UPLOAD_DIR, db_upload.id + ".complete")
+    try:
+        offset, sha256 = await uploads.append_chunks(
+            db_upload.id,
+            os.path.join(UPLOAD_DIR, db_upload.id),
+            upload_offset,
+            request.stream(),
+            db_upload.size,
+            complete_path,
+        )
+    except uploads.OffsetMismatch as exc:
+        raise HTTPException(
+            status_code=409,
+            detail="Upload offset mismatch",
+            headers={"Upload-Offset": str(exc.expected)},
+        )
+    except uploads.UploadTooLarge:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Chunk exceeds declared size")
+
+    if sha256 is not None:
+        db_upload.completed = True
+        db_upload.sha256 = sha256
+        await anyio.to_thread.run_sync(_store, db, db_upload.filename, complete_path, db_upload.size, sha256)
+    # The commit expired db_upload; reloading it is a query, so not on the event loop
+    status_data = await anyio.to_thread.run_sync(_upload_status, db_upload)
+    status_data["offset"] = offset
+    return status_data
+
+@router.api_route("/media/blobs/{sha256}", methods=["GET", "HEAD"])
+async def get_blob(sha256: str, request: Request, db: Session = Depends(get_db)):
+    if not media_store.is_sha256(sha256):
+        raise HTTPException(status_code=404, detail="Video not found")
+    blob = await anyio.to_thread.run_sync(db.get, models.MediaBlob, sha256)
+    path = media_store.blob_path(sha256)
+    if blob is None or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Video not found")
+    # The URL names the content, so it can never change underneath a cache
+    return await media_file_response(
+        request,
+        path,
+        headers={"cache-control": media_store.IMMUTABLE_CACHE_CONTROL},
+        media_type=blob.media_type,
+        etag=f'"{sha256}"',
+    )
+
+@router.api_route("/media/{filename}", methods=["GET", "HEAD"])
+async def get_video(filename: str, request: Request, db: Session = Depends(get_db)):
+    blob = await anyio.to_thread.run_sync(media_store.resolve, db, filename)
+    if blob is not None:
+        # Names can be repointed, so caches revalidate; the content hash makes that a cheap 304
+        return await media_file_response(
+            request,
+            media_store.blob_path(blob.sha256),
+            headers={"cache-control": "no-cache", "content-location": media_store.blob_url(blob.sha256)},
+            media_type=blob.media_type,
+            etag=f'"{blob.sha256}"',
+        )
+    # Files stored before the content-addressed store existed
     file_path = os.path.join(MEDIA_DIR, filename)
-    if not os.path.exists(file_path):
+    if not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="Video not found")
+    return await media_file_response(request, file_path)
+
+@router.delete("/media/{filename}")
+def delete_video(filename: str, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if not media_store.unlink(db, filename):
         raise HTTPException(status_code=404, detail="Video not found")
-    with open(file_path, "rb") as video_file:
-        return Response(content=video_file.read(), media_type="video/mp4")
\ No newline at end of file
+    # Collect once the released blob is past the grace period
+    jobs.enqueue(db, "media_gc", delay=media_store.MEDIA_GC_GRACE_SECONDS + 60)
+    db.commit()
+    return {"detail": "Video deleted"}
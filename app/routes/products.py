@@ -1,27 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
-from app import models, schemas, auth
-from app.database import get_db
+from typing import List, Optional
+from app import crud, invalidation, models, schemas, auth
+from app.cache import cached_list_response
+from app.pagination import DEFAULT_LIMIT, MAX_LIMIT, InvalidCursor, SortOption
+from app.database import get_db, get_session
 
 router = APIRouter()
 
 @router.post("/products/", response_model=schemas.Product)
-def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
     db_product = models.Product(**product.dict())
     db.add(db_product)
+    invalidation.publish(db, "catalog", "products")
     db.commit()
     db.refresh(db_product)
     return db_product
 
 @router.get("/products/", response_model=List[schemas.Product])
-def read_products(db: Session = Depends(get_db)):
-    return db.query(models.Product).all()
+async def read_products(
+    type: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: SortOption = SortOption.newest,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    db=Depends(get_session),
+):
+    try:
+        return await cached_list_response(
+            "products",
+            (type, min_price, max_price, sort, cursor, limit),
+            lambda columns: crud.get_products_async(
+                db, type=type, min_price=min_price, max_price=max_price, sort=sort, cursor=cursor, limit=limit, columns=columns
+            ),
+            schemas.Product,
+            models.Product,
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.put("/products/{product_id}", response_model=schemas.Product)
-def update_product(product_id: int, product: schemas.ProductCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def update_product(product_id: int, product: schemas.ProductCreate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
     db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
@@ -29,17 +51,19 @@ def update_product(product_id: int, product: schemas.ProductCreate, db: Session
         raise HTTPException(status_code=404, detail="Product not found")
     for key, value in product.dict().items():
         setattr(db_product, key, value)
+    invalidation.publish(db, "catalog", "products")
     db.commit()
     db.refresh(db_product)
     return db_product
 
 @router.delete("/products/{product_id}")
-def delete_product(product_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def delete_product(product_id: int, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
     db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
     db.delete(db_product)
+    invalidation.publish(db, "catalog", "products")
     db.commit()
     return {"detail": "Product deleted"}
\ No newline at end of file
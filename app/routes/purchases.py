@@ -1,19 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.responses import Response
+from sqlalchemy import select
 from typing import List
-from app import models, schemas, auth
-from app.database import get_db
+from app import fastjson, jobs, models, schemas, auth
+from app.database import get_session
 
 router = APIRouter()
 
 @router.post("/purchases/", response_model=schemas.Purchase)
-def create_purchase(purchase: schemas.PurchaseCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+async def create_purchase(purchase: schemas.PurchaseCreate, db=Depends(get_session), current_user: auth.Principal = Depends(auth.get_current_user)):
     db_purchase = models.Purchase(user_id=current_user.id, **purchase.dict())
     db.add(db_purchase)
-    db.commit()
-    db.refresh(db_purchase)
+    jobs.enqueue(db, "sales_rollup")
+    await db.commit()
+    await db.refresh(db_purchase)
     return db_purchase
 
 @router.get("/purchases/", response_model=List[schemas.Purchase])
-def read_purchases(db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
-    return db.query(models.Purchase).filter(models.Purchase.user_id == current_user.id).all()
\ No newline at end of file
+async def read_purchases(db=Depends(get_session), current_user: auth.Principal = Depends(auth.get_current_user)):
+    if fastjson.FAST_JSON_RESPONSES:
+        columns = fastjson.columns_for(models.Purchase, schemas.Purchase)
+        rows = await db.execute(select(*columns).filter(models.Purchase.user_id == current_user.id))
+        return Response(content=fastjson.dumps_rows(rows), media_type="application/json")
+    return (await db.scalars(select(models.Purchase).filter(models.Purchase.user_id == current_user.id))).all()
\ No newline at end of file
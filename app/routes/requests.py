@@ -1,34 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 from app import models, schemas, auth
-from app.database import get_db
+from app.database import get_db, get_session
+from app import events
 
 router = APIRouter()
 
 @router.post("/requests/", response_model=schemas.Request)
-def create_request(request: schemas.RequestCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def create_request(request: schemas.RequestCreate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     db_request = models.Request(user_id=current_user.id, **request.dict())
     db.add(db_request)
+    db.flush()
+    _publish(db, "request.created", db_request)
     db.commit()
     db.refresh(db_request)
     return db_request
 
 @router.get("/requests/", response_model=List[schemas.Request])
-def read_requests(db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def read_requests(db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if not current_user.is_admin:
         return db.query(models.Request).filter(models.Request.user_id == current_user.id).all()
     return db.query(models.Request).all()
 
 @router.put("/requests/{request_id}", response_model=schemas.Request)
-def update_request(request_id: int, request: schemas.RequestBase, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def update_request(request_id: int, request: schemas.RequestBase, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
     db_request = db.query(models.Request).filter(models.Request.id == request_id).first()
     if not db_request:
         raise HTTPException(status_code=404, detail="Request not found")
+    previous_status = db_request.status
     for key, value in request.dict().items():
         setattr(db_request, key, value)
+    db.flush()
+    _publish(db, "request.updated", db_request, previous_status=previous_status)
     db.commit()
     db.refresh(db_request)
-    return db_request
\ No newline at end of file
+    return db_request
+
+@router.get("/requests/stream")
+async def stream_requests(
+    last_event_id: str | None = Header(None),
+    db=Depends(get_session),
+    current_user: auth.Principal = Depends(auth.get_stream_user),
+):
+    # Server-sent events for the caller's requests (every request for admins).
+    # Events come from request_events, so changes handled by any worker show up;
+    # EventSource resends Last-Event-ID on reconnect and missed events are replayed.
+    # The session lives as long as the stream, so release its pooled connection now
+    await db.rollback()
+    return StreamingResponse(
+        events.event_stream(None if current_user.is_admin else current_user.id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/requests/stream/token", response_model=schemas.Token)
+def create_stream_token(current_user: auth.Principal = Depends(auth.get_current_user)):
+    # EventSource can't send headers, so browsers fetch this and pass it as ?token=.
+    # It only opens event streams and expires quickly, so URL logs leak little
+    return {"access_token": auth.create_stream_token(current_user.username), "token_type": "bearer"}
+
+def _publish(db: Session, event_type: str, db_request: models.Request, **extra):
+    # Called after a flush, so the row has its id and defaults
+    data = schemas.Request.model_validate(db_request).model_dump(mode="json")
+    events.publish(db, db_request.user_id, event_type, {**data, **extra})
\ No newline at end of file
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Literal, Optional
+from app import schemas, search
+from app.database import get_session
+
+router = APIRouter()
+
+@router.get("/search", response_model=List[schemas.SearchHit])
+async def search_catalog(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Optional[Literal["product", "service", "tutorial"]] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db=Depends(get_session),
+):
+    if not search.search_available:
+        raise HTTPException(status_code=503, detail="Search is not available")
+    match_query = search.build_match_query(q)
+    if match_query is None:
+        return []
+    item_types = [type] if type else list(search.SEARCH_INDEXES)
+    rows = await db.execute(
+        search.search_statement(item_types),
+        {"query": match_query, "limit": limit, "offset": offset},
+    )
+    return [dict(row._mapping) for row in rows]
\ No newline at end of file
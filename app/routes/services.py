@@ -1,27 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
-from app import models, schemas, auth
-from app.database import get_db
+from typing import List, Optional
+from app import crud, invalidation, models, schemas, auth
+from app.cache import cached_list_response
+from app.pagination import DEFAULT_LIMIT, MAX_LIMIT, InvalidCursor, SortOption
+from app.database import get_db, get_session
 
 router = APIRouter()
 
 @router.post("/services/", response_model=schemas.Service)
-def create_service(service: schemas.ServiceCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def create_service(service: schemas.ServiceCreate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
     db_service = models.Service(**service.dict())
     db.add(db_service)
+    invalidation.publish(db, "catalog", "services")
     db.commit()
     db.refresh(db_service)
     return db_service
 
 @router.get("/services/", response_model=List[schemas.Service])
-def read_services(db: Session = Depends(get_db)):
-    return db.query(models.Service).all()
+async def read_services(
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: SortOption = SortOption.newest,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    db=Depends(get_session),
+):
+    try:
+        return await cached_list_response(
+            "services",
+            (category, min_price, max_price, sort, cursor, limit),
+            lambda columns: crud.get_services_async(
+                db, category=category, min_price=min_price, max_price=max_price, sort=sort, cursor=cursor, limit=limit, columns=columns
+            ),
+            schemas.Service,
+            models.Service,
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.put("/services/{service_id}", response_model=schemas.Service)
-def update_service(service_id: int, service: schemas.ServiceCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def update_service(service_id: int, service: schemas.ServiceCreate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
     db_service = db.query(models.Service).filter(models.Service.id == service_id).first()
@@ -29,17 +51,19 @@ def update_service(service_id: int, service: schemas.ServiceCreate, db: Session
         raise HTTPException(status_code=404, detail="Service not found")
     for key, value in service.dict().items():
         setattr(db_service, key, value)
+    invalidation.publish(db, "catalog", "services")
     db.commit()
     db.refresh(db_service)
     return db_service
 
 @router.delete("/services/{service_id}")
-def delete_service(service_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def delete_service(service_id: int, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
     db_service = db.query(models.Service).filter(models.Service.id == service_id).first()
     if not db_service:
         raise HTTPException(status_code=404, detail="Service not found")
     db.delete(db_service)
+    invalidation.publish(db, "catalog", "services")
     db.commit()
     return {"detail": "Service deleted"}
\ No newline at end of file
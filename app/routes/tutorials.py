@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
-from app import models, schemas, auth
-from app.database import get_db
+from typing import List, Optional
+from app import crud, invalidation, models, schemas, auth
+from app.cache import cached_list_response
+from app.pagination import DEFAULT_LIMIT, MAX_LIMIT, InvalidCursor, SortOption
+from app.database import get_db, get_session
 
 router = APIRouter()
 
 @router.post("/tutorials/", response_model=schemas.Tutorial)
-def create_tutorial(tutorial: schemas.TutorialCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def create_tutorial(tutorial: schemas.TutorialCreate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
     db_tutorial = models.Tutorial(
@@ -20,16 +22,36 @@ def create_tutorial(tutorial: schemas.TutorialCreate, db: Session = Depends(get_
         video_file=tutorial.video_file
     )
     db.add(db_tutorial)
+    invalidation.publish(db, "catalog", "tutorials")
     db.commit()
     db.refresh(db_tutorial)
     return db_tutorial
 
 @router.get("/tutorials/", response_model=List[schemas.Tutorial])
-def read_tutorials(db: Session = Depends(get_db)):
-    return db.query(models.Tutorial).all()
+async def read_tutorials(
+    tutorial_type: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: SortOption = SortOption.newest,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    db=Depends(get_session),
+):
+    try:
+        return await cached_list_response(
+            "tutorials",
+            (tutorial_type, min_price, max_price, sort, cursor, limit),
+            lambda columns: crud.get_tutorials_async(
+                db, tutorial_type=tutorial_type, min_price=min_price, max_price=max_price, sort=sort, cursor=cursor, limit=limit, columns=columns
+            ),
+            schemas.Tutorial,
+            models.Tutorial,
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.put("/tutorials/{tutorial_id}", response_model=schemas.Tutorial)
-def update_tutorial(tutorial_id: int, tutorial: schemas.TutorialCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def update_tutorial(tutorial_id: int, tutorial: schemas.TutorialCreate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
     db_tutorial = db.query(models.Tutorial).filter(models.Tutorial.id == tutorial_id).first()
@@ -42,17 +64,19 @@ def update_tutorial(tutorial_id: int, tutorial: schemas.TutorialCreate, db: Sess
     db_tutorial.posted_date = tutorial.posted_date
     db_tutorial.video_url = tutorial.video_url
     db_tutorial.video_file = tutorial.video_file
+    invalidation.publish(db, "catalog", "tutorials")
     db.commit()
     db.refresh(db_tutorial)
     return db_tutorial
 
 @router.delete("/tutorials/{tutorial_id}")
-def delete_tutorial(tutorial_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def delete_tutorial(tutorial_id: int, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
     db_tutorial = db.query(models.Tutorial).filter(models.Tutorial.id == tutorial_id).first()
     if not db_tutorial:
         raise HTTPException(status_code=404, detail="Tutorial not found")
     db.delete(db_tutorial)
+    invalidation.publish(db, "catalog", "tutorials")
     db.commit()
     return {"detail": "Tutorial deleted"}
\ No newline at end of file
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, Field, validator
 from datetime import datetime, date
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 class UserBase(BaseModel):
     username: str
@@ -85,6 +85,12 @@ class CartItemBase(BaseModel):
 class CartItemCreate(CartItemBase):
     pass
 
+# Keeps one batch's IN and VALUES lists well under SQLite's bound-variable limit
+MAX_CART_BATCH = 100
+
+class CartItemBatch(BaseModel):
+    items: List[CartItemCreate] = Field(max_length=MAX_CART_BATCH)
+
 class CartItemUpdate(BaseModel):
     quantity: int
 
@@ -94,6 +100,20 @@ class CartItem(CartItemBase):
     class Config:
         from_attributes = True
 
+class CatalogItemSummary(BaseModel):
+    id: int
+    name: str
+    price: float
+    image: Optional[str] = None
+
+class CartLine(CartItem):
+    item: Optional[CatalogItemSummary] = None
+    line_total: float
+
+class CartView(BaseModel):
+    items: List[CartLine]
+    subtotal: float
+
 class PurchaseBase(BaseModel):
     item_id: int
     item_type: str
@@ -110,6 +130,10 @@ class Purchase(PurchaseBase):
     class Config:
         from_attributes = True
 
+class Checkout(BaseModel):
+    purchases: List[Purchase]
+    total_price: float
+
 class RequestBase(BaseModel):
     title: str
     description: str
@@ -125,6 +149,30 @@ class Request(RequestBase):
     class Config:
         from_attributes = True
 
+class UploadCreate(BaseModel):
+    filename: str
+    size: int
+
+class Upload(BaseModel):
+    id: str
+    filename: str
+    size: int
+    offset: int
+    completed: bool
+    sha256: Optional[str] = None
+
+class SearchHit(BaseModel):
+    item_type: str
+    id: int
+    title: str
+    price: float
+    snippet: str
+    rank: float
+
 class Token(BaseModel):
     access_token: str
-    token_type: str
\ No newline at end of file
+    token_type: str
+    refresh_token: Optional[str] = None
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
\ No newline at end of file
@@ -0,0 +1,99 @@
+import logging
+import re
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# item_type -> (content table, indexed columns, column shown as the title)
+SEARCH_INDEXES = {
+    "product": ("products", ("name", "description"), "name"),
+    "service": ("services", ("name", "description"), "name"),
+    "tutorial": ("tutorials", ("title", "content"), "title"),
+}
+SNIPPET_TOKENS = 12
+
+search_available = False
+
+def _fts_table(table: str) -> str:
+    return f"{table}_fts"
+
+def _ddl(table: str, columns: tuple) -> list[str]:
+    # External-content FTS5 table kept in sync by triggers, so ORM writes,
+    # bulk imports and raw SQL all update the index
+    fts = _fts_table(table)
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{cols}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+    ]
+
+def ensure_search_index(connection):
+    # Run by the migrations, inside their transaction; workers only call
+    # detect_search_index at startup
+    global search_available
+    if connection.dialect.name != "sqlite":
+        logger.warning("Full-text search needs SQLite FTS5; /api/search is disabled")
+        return
+    try:
+        with connection.begin_nested():
+            for table, columns, _ in SEARCH_INDEXES.values():
+                fts = _fts_table(table)
+                exists = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": fts}
+                ).first()
+                for statement in _ddl(table, columns):
+                    connection.execute(text(statement))
+                if not exists:
+                    # Index rows that were written before the FTS table existed
+                    connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+    except OperationalError as exc:
+        logger.warning("SQLite FTS5 unavailable (%s); /api/search is disabled", exc.orig)
+        return
+    search_available = True
+
+def detect_search_index(engine):
+    global search_available
+    if engine.dialect.name != "sqlite":
+        search_available = False
+        return
+    names = [_fts_table(table) for table, _, _ in SEARCH_INDEXES.values()]
+    statement = text("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN :names").bindparams(
+        bindparam("names", expanding=True)
+    )
+    with engine.connect() as connection:
+        search_available = connection.execute(statement, {"names": names}).scalar() == len(names)
+    if not search_available:
+        logger.warning("Search index is missing; run the migrations to enable /api/search")
+
+def build_match_query(q: str) -> str | None:
+    # Treat user input as plain terms: quote each one so FTS5 syntax can't leak
+    # in, and prefix-match every term so partial words find results
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+def search_statement(item_types: list[str]):
+    selects = []
+    for item_type in item_types:
+        table, _, title_column = SEARCH_INDEXES[item_type]
+        fts = _fts_table(table)
+        selects.append(
+            f"SELECT '{item_type}' AS item_type, c.id AS id, c.{title_column} AS title, c.price AS price, "
+            f"snippet({fts}, -1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) AS snippet, "
+            f"bm25({fts}) AS rank "
+            f"FROM {fts} JOIN {table} c ON c.id = {fts}.rowid WHERE {fts} MATCH :query"
+        )
+    # bm25 is lower-is-better; id breaks ties so pages are stable
+    return text(" UNION ALL ".join(selects) + " ORDER BY rank, item_type, id LIMIT :limit OFFSET :offset")
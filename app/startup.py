@@ -0,0 +1,78 @@
+import importlib
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+class StartupReport:
+    # Boot timings for one worker: module imports, lifespan steps and the
+    # first request it served
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports: dict = {}
+        self.steps: dict = {}
+        self.import_seconds = None
+        self.ready_seconds = None
+        self.first_request = None
+
+    def import_module(self, name: str):
+        # Modules already pulled in by an earlier import count as ~0 here;
+        # shared dependencies are charged to whichever router imports them first
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        self.imports[name] = round((time.perf_counter() - started) * 1000, 2)
+        return module
+
+    def imported(self):
+        self.import_seconds = time.perf_counter() - self.started
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    def ready(self):
+        self.ready_seconds = time.perf_counter() - self.started
+        logger.info("Worker ready in %.1f ms: %s", self.ready_seconds * 1000, self.as_dict())
+
+    def record_first_request(self, method: str, path: str, duration: float):
+        self.first_request = {
+            "method": method,
+            "path": path,
+            "latency_ms": round(duration * 1000, 2),
+            "since_start_ms": round((time.perf_counter() - self.started) * 1000, 2),
+        }
+        logger.info("First request served: %s", self.first_request)
+
+    def as_dict(self) -> dict:
+        return {
+            "import_ms": None if self.import_seconds is None else round(self.import_seconds * 1000, 2),
+            "ready_ms": None if self.ready_seconds is None else round(self.ready_seconds * 1000, 2),
+            "router_imports_ms": self.imports,
+            "lifespan_steps_ms": self.steps,
+            "first_request": self.first_request,
+        }
+
+report = StartupReport()
+
+class FirstRequestTimer:
+    # Times the first HTTP request only; afterwards it is a single flag check
+    def __init__(self, app, report: StartupReport = report):
+        self.app = app
+        self.report = report
+        self.pending = True
+
+    async def __call__(self, scope, receive, send):
+        if not self.pending or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.pending = False
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.report.record_first_request(scope["method"], scope["path"], time.perf_counter() - started)
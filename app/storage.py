@@ -0,0 +1,77 @@
+import logging
+import os
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine, make_url
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Negative cache_size is in KiB rather than pages
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+REPORTED_PRAGMAS = ["journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "foreign_keys"]
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def is_memory(url: str) -> bool:
+    return make_url(url).database in (None, "", ":memory:")
+
+def engine_options(url: str) -> dict:
+    options = {}
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+        if is_memory(url):
+            # In-memory databases live in a single connection; leave pooling to the dialect
+            return options
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+def _apply_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        # busy_timeout first so the journal_mode switch itself waits on a busy file
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+def configure(engine: Engine):
+    # Accepts the sync engine, or AsyncEngine.sync_engine
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _apply_pragmas)
+
+def describe(engine: Engine) -> dict:
+    settings = {"url": engine.url.render_as_string(hide_password=True), "pool": engine.pool.status()}
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as connection:
+            for pragma in REPORTED_PRAGMAS:
+                settings[pragma] = connection.execute(text(f"PRAGMA {pragma}")).scalar()
+    return settings
+
+def check(engine: Engine) -> dict:
+    settings = describe(engine)
+    logger.info("Database storage profile: %s", settings)
+    journal_mode = settings.get("journal_mode")
+    if journal_mode is not None and journal_mode.lower() != SQLITE_JOURNAL_MODE.lower() and not is_memory(DATABASE_URL):
+        logger.warning("Requested journal_mode=%s but SQLite is using %s", SQLITE_JOURNAL_MODE, journal_mode)
+    return settings
@@ -0,0 +1,164 @@
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+
+CHUNK_SIZE = 256 * 1024
+
+# Magic bytes for common media containers, used when the extension is unknown
+MEDIA_SIGNATURES = [
+    (4, b"ftypqt", "video/quicktime"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+    (0, b"OggS", "video/ogg"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"\x89PNG", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+]
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+def guess_media_type(path: str) -> str:
+    media_type, _ = mimetypes.guess_type(path)
+    if media_type:
+        return media_type
+    with open(path, "rb") as f:
+        head = f.read(16)
+    for offset, signature, sniffed_type in MEDIA_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return sniffed_type
+    return "application/octet-stream"
+
+def make_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    # Returns an inclusive (start, end) pair, or None when the header should be ignored
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        # Multipart ranges are not worth the complexity; serving the full body is allowed
+        return None
+    start_text, sep, end_text = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_text == "":
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - suffix, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _if_range_matches(request: Request, etag: str, last_modified: str) -> bool:
+    if_range = request.headers.get("if-range")
+    return if_range is None or if_range in (etag, last_modified)
+
+class FileRangeResponse(Response):
+    def __init__(self, path: str, start: int, end: int, status_code: int, headers: dict):
+        self.path = path
+        self.start = start
+        self.end = end
+        super().__init__(status_code=status_code, headers=headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        count = self.end - self.start + 1
+        if scope["method"] == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions", {})
+        if "http.response.zerocopysend" in extensions:
+            # The server owns the socket, so hand it the descriptor and let it call sendfile
+            file = await anyio.to_thread.run_sync(open, self.path, "rb")
+            try:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False,
+                })
+            finally:
+                await anyio.to_thread.run_sync(file.close)
+            return
+        if "http.response.pathsend" in extensions and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+            return
+
+        async with await anyio.open_file(self.path, "rb") as file:
+            await file.seek(self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File shrank underneath us; close the body so the client sees a short read
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+async def media_file_response(
+    request: Request,
+    path: str,
+    headers: dict | None = None,
+    media_type: str | None = None,
+    etag: str | None = None,
+) -> Response:
+    # Content-addressed callers pass the stored media type and a hash-based etag
+    stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    size = stat_result.st_size
+    etag = etag or make_etag(stat_result)
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    response_headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": last_modified,
+        **(headers or {}),
+    }
+
+    if _not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=response_headers)
+
+    if media_type is None:
+        media_type = await anyio.to_thread.run_sync(guess_media_type, path)
+    response_headers["content-type"] = media_type
+
+    range_header = request.headers.get("range")
+    if range_header and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            response_headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=response_headers)
+        if byte_range is not None:
+            start, end = byte_range
+            response_headers["content-range"] = f"bytes {start}-{end}/{size}"
+            response_headers["content-length"] = str(end - start + 1)
+            return FileRangeResponse(path, start, end, 206, response_headers)
+
+    response_headers["content-length"] = str(size)
+    return FileRangeResponse(path, 0, size - 1, 200, response_headers)
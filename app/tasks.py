@@ -0,0 +1,13 @@
+from sqlalchemy.orm import Session
+from app import analytics, media_store
+from app.jobs import register
+
+# Background job handlers; importing this module registers them
+
+@register("sales_rollup", concurrency=1, coalesce=True)
+def sales_rollup(db: Session, payload: dict):
+    analytics.compact_sales(db)
+
+@register("media_gc", concurrency=1, max_attempts=3, backoff=60.0, coalesce=True)
+def media_gc(db: Session, payload: dict):
+    media_store.collect_garbage(db)
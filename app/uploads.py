@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import anyio
+from fastapi import UploadFile
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no cross-process locking off POSIX
+    fcntl = None
+
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(5 * 1024 ** 3)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+class UploadTooLarge(Exception):
+    pass
+
+class OffsetMismatch(Exception):
+    def __init__(self, expected: int):
+        super().__init__(f"Expected offset {expected}")
+        self.expected = expected
+
+# Running checksums of in-progress resumable uploads as upload id -> (offset,
+# hasher), bounded so abandoned uploads can't pile up. A hash is only reused
+# while its offset matches the file: another worker may have appended since.
+# Otherwise, or once evicted or lost to a restart, it is rebuilt from disk
+UPLOAD_HASHER_CACHE_SIZE = int(os.getenv("UPLOAD_HASHER_CACHE_SIZE", "256"))
+_hashers: OrderedDict[str, tuple[int, "hashlib._Hash"]] = OrderedDict()
+
+class _UploadLock:
+    # Serializes appends within this process, so only one thread per upload
+    # waits on the file lock. Dropped once no request holds or waits on it
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+_locks: dict[str, _UploadLock] = {}
+
+@asynccontextmanager
+async def _upload_lock(upload_id: str):
+    entry = _locks.get(upload_id)
+    if entry is None:
+        entry = _locks[upload_id] = _UploadLock()
+    entry.users += 1
+    try:
+        async with entry.lock:
+            yield
+    finally:
+        entry.users -= 1
+        if entry.users == 0:
+            del _locks[upload_id]
+
+def _remember_hasher(upload_id: str, offset: int, hasher):
+    _hashers[upload_id] = (offset, hasher)
+    _hashers.move_to_end(upload_id)
+    while len(_hashers) > UPLOAD_HASHER_CACHE_SIZE:
+        _hashers.popitem(last=False)
+
+def _write_chunk(file, hasher, chunk: bytes):
+    hasher.update(chunk)
+    file.write(chunk)
+
+def _hash_file(path: str):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+async def save_upload(upload: UploadFile, dest_path: str, max_size: int = MAX_UPLOAD_SIZE) -> tuple[int, str]:
+    part_path = dest_path + ".part"
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        file = await anyio.to_thread.run_sync(open, part_path, "wb")
+        try:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge()
+                await anyio.to_thread.run_sync(_write_chunk, file, hasher, chunk)
+        finally:
+            await anyio.to_thread.run_sync(file.close)
+        await anyio.to_thread.run_sync(os.replace, part_path, dest_path)
+    except BaseException:
+        await anyio.to_thread.run_sync(_remove_quietly, part_path)
+        raise
+    return size, hasher.hexdigest()
+
+def create_part_file(part_path: str):
+    os.makedirs(os.path.dirname(part_path), exist_ok=True)
+    open(part_path, "wb").close()
+
+def _open_for_append(part_path: str):
+    # Appends from other worker processes are serialized by an exclusive flock
+    # on the part file, held until the file is closed. Returns the file and the
+    # offset it is at once the lock is ours
+    file = open(part_path, "ab")
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        stat = os.fstat(file.fileno())
+        try:
+            renamed = os.stat(part_path).st_ino != stat.st_ino
+        except FileNotFoundError:
+            renamed = True
+        if renamed:
+            # Another worker completed the upload while we waited for the lock
+            raise OffsetMismatch(stat.st_size)
+    except BaseException:
+        file.close()
+        raise
+    return file, stat.st_size
+
+def current_offset(part_path: str) -> int:
+    try:
+        return os.path.getsize(part_path)
+    except FileNotFoundError:
+        return 0
+
+async def append_chunks(
+    upload_id: str,
+    part_path: str,
+    offset: int,
+    chunks: AsyncIterator[bytes],
+    total_size: int,
+    dest_path: str,
+) -> tuple[int, str | None]:
+    # Returns the new offset, plus the sha256 once the final byte has arrived
+    async with _upload_lock(upload_id):
+        file, current = await anyio.to_thread.run_sync(_open_for_append, part_path)
+        try:
+            if offset != current:
+                raise OffsetMismatch(current)
+            cached = _hashers.pop(upload_id, None)
+            if cached is not None and cached[0] == current:
+                hasher = cached[1]
+            else:
+                hasher = await anyio.to_thread.run_sync(_hash_file, part_path)
+
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                if current + len(chunk) > total_size:
+                    raise UploadTooLarge()
+                await anyio.to_thread.run_sync(_write_chunk, file, hasher, chunk)
+                current += len(chunk)
+
+            if current < total_size:
+                await anyio.to_thread.run_sync(file.flush)
+                _remember_hasher(upload_id, current, hasher)
+                return current, None
+            # Renamed while the lock is still held, so no other worker appends to it
+            await anyio.to_thread.run_sync(os.replace, part_path, dest_path)
+            return current, hasher.hexdigest()
+        finally:
+            # On failure the hasher is simply not put back: it may have hashed
+            # bytes that never reached disk. Closing releases the file lock
+            await anyio.to_thread.run_sync(file.close)
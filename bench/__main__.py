@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+DEFAULT_THRESHOLD = 0.2
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m bench", description="Load and latency benchmark for the API routes"
+    )
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent simulated clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to drive load")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--catalog", type=int, default=5000, help="rows seeded per catalog table")
+    parser.add_argument("--purchases", type=int, default=20000)
+    parser.add_argument("--media-size", type=int, default=4 * 1024 * 1024, help="bytes in the seeded media file")
+    parser.add_argument("--scenarios", default="catalog,cart,purchases,media", help="comma separated scenario names")
+    parser.add_argument("--relogin-every", type=int, default=10, help="rounds between logins per client, 0 to log in once")
+    parser.add_argument("--workdir", help="directory for the benchmark database and media (default: a temp dir)")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--save-baseline", help="write this run's report as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed relative slowdown, 0.2 = 20%%")
+    return parser.parse_args(argv)
+
+async def drive(app, args, scenarios) -> dict:
+    import httpx
+    from bench.report import summarize
+    from bench.scenarios import Recorder, worker
+
+    recorder = Recorder()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            deadline = started + args.duration
+            await asyncio.gather(*(
+                worker(client, recorder, f"bench{i % args.users}", scenarios, args.catalog, deadline, args.relogin_every)
+                for i in range(args.concurrency)
+            ))
+            elapsed = time.perf_counter() - started
+    return summarize(recorder.latencies, recorder.errors, elapsed)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.users < 1 or args.catalog < 1:
+        sys.exit("--users and --catalog must be at least 1")
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    for name in ("output", "baseline", "save_baseline"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    # The app reads DATABASE_URL and resolves media/ at import time, so point
+    # both at the scratch directory before anything from app is imported
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(workdir)
+
+    from bench.report import compare
+    from bench.scenarios import SCENARIOS
+    from bench.seed import seed
+
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    seeded = seed(args.users, args.catalog, args.purchases, args.media_size)
+    from app.main import app
+
+    report = asyncio.run(drive(app, args, scenarios))
+    report["config"] = {
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "scenarios": scenarios,
+        "seed": seeded,
+        "db_mode": os.getenv("DB_MODE", "sync"),
+        "fast_json": os.getenv("FAST_JSON_RESPONSES", "0"),
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            f.write(output + "\n")
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
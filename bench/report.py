@@ -0,0 +1,57 @@
+import math
+
+# Metrics where a larger value is worse, and those where a smaller value is worse
+HIGHER_IS_WORSE = ("p50_ms", "p95_ms", "p99_ms")
+LOWER_IS_WORSE = ("throughput_rps",)
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+def summarize(latencies: dict, errors: dict, elapsed: float) -> dict:
+    routes = {}
+    for route in sorted(latencies):
+        values = sorted(latencies[route])
+        routes[route] = {
+            "requests": len(values),
+            "errors": errors.get(route, 0),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 3),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "errors": sum(route["errors"] for route in routes.values()),
+        "throughput_rps": round(total / elapsed, 2),
+        "routes": routes,
+    }
+
+def compare(report: dict, baseline: dict, threshold: float) -> list[dict]:
+    # A regression is a route metric that moved the wrong way by more than
+    # threshold (a fraction) against the baseline; routes missing from either side are skipped
+    regressions = []
+    for route, current in report["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if previous is None:
+            continue
+        for metric in HIGHER_IS_WORSE + LOWER_IS_WORSE:
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (metric in HIGHER_IS_WORSE and change > threshold) or (metric in LOWER_IS_WORSE and -change > threshold):
+                regressions.append({
+                    "route": route,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": round(change, 3),
+                })
+    return regressions
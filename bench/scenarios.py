@@ -0,0 +1,85 @@
+import itertools
+import random
+import time
+from collections import defaultdict
+import httpx
+from bench.seed import BENCH_PASSWORD, MEDIA_FILENAME
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, url: str, expected=(200,), **kwargs):
+        # route is the path template, so /api/cart/{id} is one series however many ids are hit
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[route].append(time.perf_counter() - started)
+        if response.status_code not in expected:
+            self.errors[route] += 1
+        return response
+
+async def login(client, recorder, username):
+    response = await recorder.call(
+        client, "POST /api/login", "POST", "/api/login",
+        data={"username": username, "password": BENCH_PASSWORD},
+    )
+    if response.status_code != 200:
+        return {}
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def catalog_lists(client, recorder, headers, catalog):
+    for path in ("products", "services", "tutorials"):
+        await recorder.call(client, f"GET /api/{path}/", "GET", f"/api/{path}/", params={"limit": 50})
+    await recorder.call(
+        client, "GET /api/products/", "GET", "/api/products/",
+        params={"sort": random.choice(["price_asc", "price_desc", "oldest"]), "limit": 50},
+    )
+
+async def cart_flow(client, recorder, headers, catalog):
+    item = {"item_type": "product", "item_id": random.randint(1, catalog), "quantity": 1}
+    response = await recorder.call(
+        client, "POST /api/cart/", "POST", "/api/cart/", expected=(201,), json=item, headers=headers
+    )
+    if response.status_code != 201:
+        return
+    cart_item_id = response.json()["id"]
+    await recorder.call(client, "GET /api/cart/", "GET", "/api/cart/", headers=headers)
+    await recorder.call(
+        client, "GET /api/cart/?expand=items", "GET", "/api/cart/", params={"expand": "items"}, headers=headers
+    )
+    await recorder.call(
+        client, "PATCH /api/cart/{id}", "PATCH", f"/api/cart/{cart_item_id}", json={"quantity": 2}, headers=headers
+    )
+    await recorder.call(client, "DELETE /api/cart/{id}", "DELETE", f"/api/cart/{cart_item_id}", headers=headers)
+
+async def purchases(client, recorder, headers, catalog):
+    purchase = {"item_type": "product", "item_id": random.randint(1, catalog), "quantity": 1, "total_price": 10.0}
+    await recorder.call(client, "POST /api/purchases/", "POST", "/api/purchases/", json=purchase, headers=headers)
+    await recorder.call(client, "GET /api/purchases/", "GET", "/api/purchases/", headers=headers)
+
+async def media_download(client, recorder, headers, catalog):
+    url = f"/api/media/{MEDIA_FILENAME}"
+    await recorder.call(client, "GET /api/media/{filename}", "GET", url)
+    await recorder.call(
+        client, "GET /api/media/{filename} (range)", "GET", url, expected=(206,), headers={"Range": "bytes=0-65535"}
+    )
+
+SCENARIOS = {
+    "catalog": catalog_lists,
+    "cart": cart_flow,
+    "purchases": purchases,
+    "media": media_download,
+}
+
+async def worker(client, recorder, username, scenarios, catalog, deadline, relogin_every):
+    # Each worker is one signed-in user cycling through the scenarios; it signs
+    # in again every relogin_every rounds so login shows up in the mix
+    headers = await login(client, recorder, username)
+    for round_number in itertools.count(1):
+        for scenario in scenarios:
+            if time.perf_counter() >= deadline:
+                return
+            await SCENARIOS[scenario](client, recorder, headers, catalog)
+        if relogin_every and round_number % relogin_every == 0:
+            headers = await login(client, recorder, username)
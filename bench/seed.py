@@ -0,0 +1,77 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from app import auth, models
+
+BENCH_PASSWORD = "benchpass"
+MEDIA_FILENAME = "bench-media.bin"
+
+def seed(users: int, catalog: int, purchases: int, media_size: int) -> dict:
+    # Starts from the init_db fixtures and scales the catalog up with bulk inserts
+    import init_db
+    from app.database import SessionLocal
+
+    init_db.init_db()
+    now = datetime.utcnow()
+    hashed_password = auth.get_password_hash(BENCH_PASSWORD)
+    db = SessionLocal()
+    try:
+        db.execute(insert(models.User), [
+            {
+                "username": f"bench{i}",
+                "email": f"bench{i}@example.com",
+                "hashed_password": hashed_password,
+                "is_admin": False,
+            }
+            for i in range(users)
+        ])
+        db.execute(insert(models.Product), [
+            {
+                "name": f"Bench product {i}",
+                "type": ("Controller", "Console", "Accessory")[i % 3],
+                "price": 5 + i % 200,
+                "description": f"Seeded product number {i}",
+                "posted_date": now - timedelta(minutes=i),
+            }
+            for i in range(catalog)
+        ])
+        db.execute(insert(models.Service), [
+            {
+                "name": f"Bench service {i}",
+                "category": ("Professional", "Kits")[i % 2],
+                "price": 20 + i % 100,
+                "description": f"Seeded service number {i}",
+                "posted_date": now - timedelta(minutes=i),
+            }
+            for i in range(catalog)
+        ])
+        db.execute(insert(models.Tutorial), [
+            {
+                "title": f"Bench tutorial {i}",
+                "content": f"Seeded tutorial number {i}",
+                "tutorial_type": ("Maintenance", "Software", "Gaming")[i % 3],
+                "price": 1 + i % 20,
+                "posted_date": now - timedelta(minutes=i),
+            }
+            for i in range(catalog)
+        ])
+        # user ids 1 and 2 belong to the init_db fixtures
+        db.execute(insert(models.Purchase), [
+            {
+                "user_id": 3 + i % max(users, 1),
+                "item_id": 1 + i % max(catalog, 1),
+                "item_type": "product",
+                "quantity": 1,
+                "total_price": 5 + i % 200,
+                "purchase_date": now - timedelta(minutes=i),
+            }
+            for i in range(purchases)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    os.makedirs("media", exist_ok=True)
+    with open(os.path.join("media", MEDIA_FILENAME), "wb") as f:
+        f.write(os.urandom(media_size))
+    return {"users": users, "catalog": catalog, "purchases": purchases, "media_size": media_size}
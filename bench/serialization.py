@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+def _time(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return {"median_ms": round(statistics.median(samples) * 1000, 3), "min_ms": round(min(samples) * 1000, 3)}
+
+def run(rows: int, repeat: int) -> dict:
+    # Compares the schema-validated list path with the fast row-tuple path on
+    # the same page of products, split into fetch and encode time
+    from pydantic import TypeAdapter
+    from sqlalchemy import insert, select
+    from typing import List
+    from app import fastjson, migrations, models, schemas
+    from app.database import SessionLocal, engine
+
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        db.execute(insert(models.Product), [
+            {"name": f"Product {i}", "type": "Controller", "price": 10 + i % 90, "description": "Seeded " * 8}
+            for i in range(rows)
+        ])
+        db.commit()
+        adapter = TypeAdapter(List[schemas.Product])
+        columns = fastjson.columns_for(models.Product, schemas.Product)
+        orm_stmt = select(models.Product).limit(rows)
+        row_stmt = select(*columns).limit(rows)
+
+        def orm_fetch():
+            db.expunge_all()
+            return db.scalars(orm_stmt).all()
+
+        def row_fetch():
+            return db.execute(row_stmt).all()
+
+        orm_rows, tuple_rows = orm_fetch(), row_fetch()
+        return {
+            "rows": rows,
+            "encoder": "orjson" if fastjson.orjson is not None else "json",
+            "schema_path": {
+                "fetch": _time(orm_fetch, repeat),
+                "encode": _time(lambda: adapter.dump_json(adapter.validate_python(orm_rows, from_attributes=True)), repeat),
+                "total": _time(lambda: adapter.dump_json(adapter.validate_python(orm_fetch(), from_attributes=True)), repeat),
+            },
+            "fast_path": {
+                "fetch": _time(row_fetch, repeat),
+                "encode": _time(lambda: fastjson.dumps_rows(tuple_rows), repeat),
+                "total": _time(lambda: fastjson.dumps_rows(row_fetch()), repeat),
+            },
+        }
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.serialization", description="Compare list response serialization paths"
+    )
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="bench-serialization-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    report = run(args.rows, args.repeat)
+    schema_total = report["schema_path"]["total"]["median_ms"]
+    fast_total = report["fast_path"]["total"]["median_ms"]
+    report["speedup"] = round(schema_total / fast_total, 2) if fast_total else None
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
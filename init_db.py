@@ -1,9 +1,9 @@
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine
-from app import models, auth
+from app import models, auth, migrations
 from datetime import datetime
 
-models.Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
 
 def init_db():
     db = SessionLocal()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+# Point the app at a scratch database before anything imports app.database
+_workdir = tempfile.mkdtemp(prefix="app-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_workdir}/test.db")
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ.setdefault("CACHE_SYNC_INTERVAL", "0")
+os.chdir(_workdir)
+
+import pytest
+from app import migrations
+from app.database import SessionLocal, engine
+
+@pytest.fixture(scope="session")
+def schema():
+    migrations.upgrade(engine)
+    return engine
+
+@pytest.fixture
+def db(schema):
+    with SessionLocal() as session:
+        yield session
+
+@pytest.fixture(scope="session")
+def client(schema):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="session")
+def user_headers(client):
+    # Registers the user if needed and returns headers carrying their access token
+    def login(username: str, password: str = "pw") -> dict:
+        client.post("/api/register", json={"username": username, "email": f"{username}@example.com", "password": password})
+        token = client.post("/api/login", data={"username": username, "password": password}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+    return login
+
+@pytest.fixture(scope="session")
+def admin_headers(user_headers):
+    # Registering as "admin" grants admin rights
+    return user_headers("admin", "password")
@@ -0,0 +1,22 @@
+from datetime import datetime
+from app import models
+
+def _orders(response):
+    return sum(bucket["orders"] for bucket in response.json()["buckets"])
+
+def test_report_reads_only_and_compaction_folds_new_purchases(client, admin_headers, db):
+    client.post("/api/analytics/sales/compact", headers=admin_headers)
+    before = _orders(client.get("/api/analytics/sales", headers=admin_headers))
+
+    db.add(models.Purchase(user_id=1, item_id=1, item_type="product", quantity=2, total_price=4.0,
+                           purchase_date=datetime.utcnow()))
+    db.commit()
+    # GET leaves compaction to the job, so the new purchase isn't in the report yet
+    assert _orders(client.get("/api/analytics/sales", headers=admin_headers)) == before
+
+    assert client.post("/api/analytics/sales/compact", headers=admin_headers).json() == {"compacted": 1}
+    report = client.get("/api/analytics/sales", headers=admin_headers).json()
+    assert sum(bucket["orders"] for bucket in report["buckets"]) == before + 1
+    assert report["as_of"] is not None
+    # Compacting again finds nothing new
+    assert client.post("/api/analytics/sales/compact", headers=admin_headers).json() == {"compacted": 0}
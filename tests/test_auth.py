@@ -0,0 +1,30 @@
+from app import auth
+
+def test_register_then_login(client):
+    response = client.post("/api/register", json={"username": "alice", "email": "alice@example.com", "password": "pw"})
+    assert response.status_code == 200
+    assert response.json()["is_admin"] is False
+    duplicate = client.post("/api/register", json={"username": "alice", "email": "other@example.com", "password": "pw"})
+    assert duplicate.status_code == 400
+
+    login = client.post("/api/login", data={"username": "alice", "password": "pw"})
+    assert login.status_code == 200
+    token = login.json()["access_token"]
+    assert client.post("/api/login", data={"username": "alice", "password": "wrong"}).status_code == 401
+    assert client.get("/api/requests/", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+def test_refreshing_keeps_the_session_expiry(client):
+    client.post("/api/register", json={"username": "refresher", "email": "refresher@example.com", "password": "pw"})
+    login = client.post("/api/login", data={"username": "refresher", "password": "pw"}).json()
+    expires_at = auth.verify_refresh_token(login["refresh_token"])["expires_at"]
+
+    refreshed = client.post("/api/token/refresh", json={"refresh_token": login["refresh_token"]})
+    assert refreshed.status_code == 200
+    # Refreshing never extends the session past the login's expiry
+    assert auth.verify_refresh_token(refreshed.json()["refresh_token"])["expires_at"] == expires_at
+    again = client.post("/api/token/refresh", json={"refresh_token": refreshed.json()["refresh_token"]}).json()
+    assert auth.verify_refresh_token(again["refresh_token"])["expires_at"] == expires_at
+
+    # Refresh tokens don't authenticate requests themselves
+    headers = {"Authorization": f"Bearer {login['refresh_token']}"}
+    assert client.get("/api/requests/", headers=headers).status_code == 401
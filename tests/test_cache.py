@@ -0,0 +1,57 @@
+import threading
+from app.cache import TTLCache
+
+def test_full_clear_rejects_values_built_before_it():
+    cache = TTLCache(maxsize=10, ttl=60)
+    # A namespace that has never been invalidated on its own
+    generation = cache.generation("products")
+    cache.invalidate()
+    cache.set(("products", 1), "stale", generation)
+    assert cache.get(("products", 1)) is None
+    cache.set(("products", 1), "fresh", cache.generation("products"))
+    assert cache.get(("products", 1)) == "fresh"
+
+def test_namespace_invalidation_only_affects_that_namespace():
+    cache = TTLCache(maxsize=10, ttl=60)
+    products, services = cache.generation("products"), cache.generation("services")
+    cache.invalidate("products")
+    cache.set(("products", 1), "stale", products)
+    cache.set(("services", 1), "kept", services)
+    assert cache.get(("products", 1)) is None
+    assert cache.get(("services", 1)) == "kept"
+
+def test_delete_rejects_a_concurrent_rebuild_of_that_namespace():
+    cache = TTLCache(maxsize=10, ttl=60)
+    generation = cache.generation("user")
+    cache.delete(("user", "alice"))
+    cache.set(("user", "alice"), "stale", generation)
+    assert cache.get(("user", "alice")) is None
+
+def test_loaders_racing_invalidations_never_cache_stale_values():
+    cache = TTLCache(maxsize=1000, ttl=60)
+    version = [0]
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            version[0] += 1
+            cache.invalidate("catalog" if version[0] % 2 else None)
+
+    def reader():
+        for _ in range(2000):
+            if cache.get(("catalog",)) is None:
+                generation = cache.generation("catalog")
+                cache.set(("catalog",), version[0], generation)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for reader_thread in readers:
+        reader_thread.start()
+    for reader_thread in readers:
+        reader_thread.join()
+    stop.set()
+    thread.join()
+    # After the last invalidation nothing older than it can be cached
+    cached = cache.get(("catalog",))
+    assert cached is None or cached == version[0]
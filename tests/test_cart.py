@@ -0,0 +1,97 @@
+import threading
+from app import models
+
+def test_batch_is_capped(client, admin_headers, user_headers):
+    product = client.post(
+        "/api/products/",
+        json={"name": "Cable", "type": "Accessory", "price": 2.0, "description": "d"},
+        headers=admin_headers,
+    ).json()
+    headers = user_headers("batcher")
+    item = {"item_type": "product", "item_id": product["id"], "quantity": 1}
+
+    assert client.post("/api/cart/batch", json={"items": [item] * 101}, headers=headers).status_code == 422
+    response = client.post("/api/cart/batch", json={"items": [item] * 100}, headers=headers)
+    assert response.status_code == 201
+    assert response.json()[0]["quantity"] == 100
+
+def _product(client, admin_headers, price):
+    return client.post(
+        "/api/products/",
+        json={"name": "Widget", "type": "Checkout", "price": price, "description": "d"},
+        headers=admin_headers,
+    ).json()
+
+def _purchase_count(db, user):
+    return db.query(models.Purchase).join(models.User, models.User.id == models.Purchase.user_id).filter(models.User.username == user).count()
+
+def test_checkout_prices_on_the_server_and_empties_the_cart(client, admin_headers, db, user_headers):
+    headers = user_headers("checkout-ok")
+    product = _product(client, admin_headers, 2.5)
+    assert client.post("/api/cart/checkout", headers=headers).status_code == 400
+
+    client.post("/api/cart/", json={"item_type": "product", "item_id": product["id"], "quantity": 3}, headers=headers)
+    response = client.post("/api/cart/checkout", headers=headers)
+    assert response.status_code == 201
+    assert response.json()["total_price"] == 7.5
+    assert client.get("/api/cart/", headers=headers).json() == []
+    assert _purchase_count(db, "checkout-ok") == 1
+
+def test_checkout_of_removed_items_is_a_conflict(client, admin_headers, db, user_headers):
+    headers = user_headers("checkout-gone")
+    product = _product(client, admin_headers, 1.0)
+    line = client.post("/api/cart/", json={"item_type": "product", "item_id": product["id"]}, headers=headers).json()
+    client.delete(f"/api/products/{product['id']}", headers=admin_headers)
+
+    response = client.post("/api/cart/checkout", headers=headers)
+    assert response.status_code == 409
+    assert response.json()["detail"]["cart_item_ids"] == [line["id"]]
+    assert _purchase_count(db, "checkout-gone") == 0
+
+def _purchased(db, user):
+    return sum(
+        quantity for (quantity,) in db.query(models.Purchase.quantity)
+        .join(models.User, models.User.id == models.Purchase.user_id)
+        .filter(models.User.username == user)
+    )
+
+def test_concurrent_checkouts_buy_the_cart_once(client, admin_headers, db, user_headers):
+    headers = user_headers("checkout-race")
+    product = _product(client, admin_headers, 4.0)
+    client.post("/api/cart/", json={"item_type": "product", "item_id": product["id"], "quantity": 2}, headers=headers)
+    barrier = threading.Barrier(4)
+    statuses = []
+
+    def checkout():
+        barrier.wait()
+        statuses.append(client.post("/api/cart/checkout", headers=headers).status_code)
+
+    threads = [threading.Thread(target=checkout) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(statuses) == [201, 400, 400, 400]
+    assert _purchased(db, "checkout-race") == 2
+
+def test_quantity_added_during_checkout_is_charged_or_kept(client, admin_headers, db, user_headers):
+    headers = user_headers("checkout-bump")
+    product = _product(client, admin_headers, 1.0)
+    line = {"item_type": "product", "item_id": product["id"], "quantity": 1}
+    client.post("/api/cart/", json=line, headers=headers)
+    barrier = threading.Barrier(2)
+
+    def add_more():
+        barrier.wait()
+        for _ in range(10):
+            client.post("/api/cart/", json=line, headers=headers)
+
+    adder = threading.Thread(target=add_more)
+    adder.start()
+    barrier.wait()
+    for _ in range(5):
+        client.post("/api/cart/checkout", headers=headers)
+    adder.join()
+    # Every unit added is either bought or still in the cart, never dropped uncharged
+    left = sum(item["quantity"] for item in client.get("/api/cart/", headers=headers).json())
+    assert _purchased(db, "checkout-bump") + left == 11
@@ -0,0 +1,49 @@
+import io
+import pytest
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import func, select
+from app import catalog_import, models
+
+def test_invalid_utf8_returns_the_partial_report(db):
+    before = db.scalar(select(func.count()).select_from(models.Service))
+    good = "".join(
+        f'{{"name": "svc{i}", "description": "d", "price": 1.5, "category": "c"}}\n' for i in range(3)
+    ).encode()
+    lines = catalog_import.decode_lines(io.BytesIO(good + b'{"name": "\xff\xfe"}\n{"name": "never read"}\n'))
+    report = catalog_import.import_catalog(db, "service", lines, "ndjson", batch_size=2)
+
+    assert report["aborted"] == "invalid UTF-8"
+    assert report["inserted"] == 3
+    assert report["errors"][-1]["row"] == 4
+    assert db.scalar(select(func.count()).select_from(models.Service)) == before + 3
+
+def test_failed_import_still_invalidates_without_hiding_the_error(client, admin_headers, monkeypatch):
+    from app.cache import catalog_cache
+    generation = catalog_cache.generation("products")
+
+    def broken(db, *args):
+        # Leaves the session needing a rollback, like a failed flush mid-import
+        db.add(models.User(id=1, username="dup"))
+        try:
+            db.flush()
+        except IntegrityError:
+            raise RuntimeError("import blew up")
+
+    monkeypatch.setattr(catalog_import, "import_catalog", broken)
+    with pytest.raises(RuntimeError, match="import blew up"):
+        client.post("/api/admin/import/product", files={"file": ("p.ndjson", b"{}\n")}, headers=admin_headers)
+    assert catalog_cache.generation("products") != generation
+
+def test_cli_import_invalidates_every_worker(db, tmp_path, capsys):
+    def version():
+        db.expire_all()
+        row = db.get(models.CacheVersion, "catalog:tutorials")
+        return 0 if row is None else row.version
+
+    before = version()
+    path = tmp_path / "tutorials.ndjson"
+    path.write_text('{"title": "t", "content": "c", "tutorial_type": "video", "price": 1}\n')
+    assert catalog_import.main(["tutorial", str(path)]) == 0
+    assert '"inserted": 1' in capsys.readouterr().out
+    # The shared version row is what other workers poll
+    assert version() == before + 1
@@ -0,0 +1,33 @@
+import asyncio
+import threading
+from sqlalchemy import delete, event, select
+from app import models
+from app.database import SessionLocal, ThreadedSession
+
+def test_threaded_session_loads_rows_off_the_event_loop(schema, db):
+    db.add_all(models.Product(name=f"t{i}", type="threaded", price=1.0, description="d") for i in range(20))
+    db.commit()
+    loaded_on = []
+
+    def record(target, context):
+        loaded_on.append(threading.get_ident())
+
+    async def scenario():
+        session = ThreadedSession(SessionLocal())
+        try:
+            stmt = select(models.Product).where(models.Product.type == "threaded")
+            products = (await session.scalars(stmt)).all()
+            rows = (await session.execute(stmt)).all()
+            removed = await session.execute(delete(models.Product).where(models.Product.type == "threaded"))
+            await session.commit()
+            return products, rows, removed.rowcount
+        finally:
+            session.sync_session.close()
+
+    event.listen(models.Product, "load", record)
+    try:
+        products, rows, removed = asyncio.run(scenario())
+    finally:
+        event.remove(models.Product, "load", record)
+    assert len(products) == len(rows) == removed == 20
+    assert loaded_on and threading.get_ident() not in loaded_on
@@ -0,0 +1,85 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app import auth, events, models
+
+def _user_id(db, username: str) -> int:
+    return db.query(models.User).filter(models.User.username == username).one().id
+
+def test_replay_resumes_after_last_event_id_for_that_user_only(client, db, admin_headers, user_headers):
+    headers = user_headers("sse-replay")
+    other = user_headers("sse-other")
+    start = events._latest_id()
+    first = client.post("/api/requests/", json={"title": "a", "description": "d"}, headers=headers).json()
+    client.post("/api/requests/", json={"title": "theirs", "description": "d"}, headers=other)
+    client.put(f"/api/requests/{first['id']}", json={"title": "a", "description": "d", "status": "done"}, headers=admin_headers)
+
+    missed, resync, caught_up_to = events._replay(_user_id(db, "sse-replay"), str(start))
+    assert not resync
+    assert [event.type for event in missed] == ["request.created", "request.updated"]
+    assert json.loads(missed[1].data)["previous_status"] == "pending"
+    assert caught_up_to == events._latest_id()
+
+    # Resuming from the first event only sends what came after it
+    missed, _, _ = events._replay(_user_id(db, "sse-replay"), str(missed[0].id))
+    assert [event.type for event in missed] == ["request.updated"]
+    # Admins see everyone's
+    missed, _, _ = events._replay(None, str(start))
+    assert len(missed) == 3
+
+def test_replay_asks_for_resync_when_it_cannot_resume(client, db, user_headers):
+    headers = user_headers("sse-resync")
+    client.post("/api/requests/", json={"title": "old", "description": "d"}, headers=headers)
+    assert events._replay(None, "not-a-number")[1]
+    assert events._replay(None, str(events._latest_id() + 100))[1]
+
+    db.execute(update(models.RequestEvent).values(created_date=datetime.utcnow() - timedelta(days=30)))
+    db.commit()
+    client.post("/api/requests/", json={"title": "new", "description": "d"}, headers=headers)
+    assert events._purge() > 0
+    # Events before the oldest retained one are gone, so the client must refetch
+    assert events._replay(None, "1")[1]
+    assert not events._replay(None, str(events._latest_id() - 1))[1]
+
+def test_broker_delivers_rows_written_by_another_worker(schema, db):
+    user_id = 1_000_001
+
+    async def scenario():
+        # A second broker stands in for another worker polling the same table
+        broker = events.Broker(poll_interval=60)
+        await broker.poll()
+        mine = broker.subscribe(user_id)
+        theirs = broker.subscribe(user_id + 1)
+        admin = broker.subscribe(None)
+
+        events.publish(db, user_id, "request.created", {"id": 1})
+        db.commit()
+        await broker.poll()
+        return mine.queue, theirs.queue, admin.queue
+
+    mine, theirs, admin = asyncio.run(scenario())
+    assert mine.qsize() == 1 and admin.qsize() == 1
+    assert theirs.empty()
+    assert mine.get_nowait().type == "request.created"
+
+def test_rolled_back_writes_publish_nothing(schema, db):
+    before = events._latest_id()
+    events.publish(db, 1, "request.created", {"id": 1})
+    db.rollback()
+    assert events._latest_id() == before
+
+def test_stream_tokens_only_open_streams(client, user_headers):
+    headers = user_headers("sse-token")
+    response = client.post("/api/requests/stream/token", headers=headers)
+    assert response.status_code == 200
+    stream_token = response.json()["access_token"]
+    assert auth.verify_stream_token(stream_token) == "sse-token"
+
+    # Not usable as a bearer token anywhere else
+    assert client.get("/api/requests/", headers={"Authorization": f"Bearer {stream_token}"}).status_code == 401
+    # And the long-lived access token is not accepted in the URL
+    access_token = headers["Authorization"].split()[1]
+    assert client.get("/api/requests/stream", params={"token": access_token}).status_code == 401
+    assert client.get("/api/requests/stream", params={"access_token": access_token}).status_code == 401
+    assert client.get("/api/requests/stream").status_code == 401
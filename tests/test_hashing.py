@@ -0,0 +1,28 @@
+import asyncio
+import threading
+import pytest
+from app.hashing import HashPool, HashPoolBusy
+
+def test_cancelled_caller_keeps_its_slot_until_the_job_finishes():
+    pool = HashPool(workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def scenario():
+        waiter = asyncio.create_task(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # The hash is still running on the pool, so the cap still counts it
+        with pytest.raises(HashPoolBusy):
+            await pool.run(len, "x")
+        release.set()
+        for _ in range(100):
+            if pool.stats()["pending"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert await pool.run(len, "abc") == 3
+
+    asyncio.run(scenario())
+    assert pool.stats()["pending"] == 0
+    assert pool.rejected == 1
@@ -0,0 +1,104 @@
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+from app import jobs, models
+
+calls = []
+
+def _ok(db, payload):
+    calls.append(payload)
+
+def _boom(db, payload):
+    raise RuntimeError("boom")
+
+@pytest.fixture
+def job_types(schema, monkeypatch):
+    # Test-only types, so claims never pick up the app's own jobs
+    monkeypatch.setitem(jobs.JOB_TYPES, "test.ok", jobs.JobType(_ok))
+    monkeypatch.setitem(jobs.JOB_TYPES, "test.boom", jobs.JobType(_boom, max_attempts=2, backoff=60))
+    monkeypatch.setitem(jobs.JOB_TYPES, "test.coalesce", jobs.JobType(_ok, coalesce=True))
+    yield
+    calls.clear()
+    from app.database import SessionLocal
+    with SessionLocal() as db:
+        db.query(models.Job).filter(models.Job.type.like("test.%")).delete(synchronize_session=False)
+        db.commit()
+
+def _enqueue(db, job_type, **kwargs) -> int:
+    job = jobs.enqueue(db, job_type, **kwargs)
+    db.commit()
+    return job.id
+
+def test_enqueue_rolls_back_with_the_request(db, job_types):
+    jobs.enqueue(db, "test.ok")
+    db.rollback()
+    assert jobs.claim(["test.ok"]) is None
+
+def test_only_one_worker_claims_a_job(db, job_types):
+    job_id = _enqueue(db, "test.ok")
+    barrier = threading.Barrier(4)
+    claimed = []
+
+    def worker():
+        barrier.wait()
+        claimed.append(jobs.claim(["test.ok"]))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [row.id for row in claimed if row is not None] == [job_id]
+
+def test_expired_lease_is_claimed_again(db, job_types):
+    job_id = _enqueue(db, "test.ok")
+    assert jobs.claim(["test.ok"]).attempts == 1
+    # Still leased to the first worker
+    assert jobs.claim(["test.ok"]) is None
+
+    db.execute(update(models.Job).where(models.Job.id == job_id).values(lease_until=datetime.utcnow() - timedelta(seconds=1)))
+    db.commit()
+    reclaimed = jobs.claim(["test.ok"])
+    assert (reclaimed.id, reclaimed.attempts) == (job_id, 2)
+    assert jobs.run(reclaimed)
+    assert db.get(models.Job, job_id).status == "done"
+
+def test_failures_back_off_then_give_up(db, job_types):
+    job_id = _enqueue(db, "test.boom")
+    assert not jobs.run(jobs.claim(["test.boom"]))
+    job = db.get(models.Job, job_id)
+    assert job.status == "queued" and "boom" in job.last_error
+    # Not due again until the backoff has passed
+    assert job.run_at > datetime.utcnow() + timedelta(seconds=30)
+    assert jobs.claim(["test.boom"]) is None
+
+    db.execute(update(models.Job).where(models.Job.id == job_id).values(run_at=datetime.utcnow()))
+    db.commit()
+    assert not jobs.run(jobs.claim(["test.boom"]))
+    db.expire_all()
+    assert db.get(models.Job, job_id).status == "failed"
+
+def test_coalesced_run_settles_jobs_queued_before_it(db, job_types):
+    earlier = [_enqueue(db, "test.coalesce", payload={"n": n}) for n in range(3)]
+    claimed = jobs.claim(["test.coalesce"])
+    later = _enqueue(db, "test.coalesce", payload={"n": 3})
+    db.execute(update(models.Job).where(models.Job.id == later).values(created_date=claimed.started_at + timedelta(seconds=1)))
+    db.commit()
+
+    assert jobs.run(claimed)
+    assert len(calls) == 1
+    db.expire_all()
+    assert {db.get(models.Job, job_id).status for job_id in earlier} == {"done"}
+    # Queued after the run started, so it may not be covered by it
+    assert db.get(models.Job, later).status == "queued"
+
+def test_coalesced_run_leaves_jobs_scheduled_for_later(db, job_types):
+    due = _enqueue(db, "test.coalesce")
+    delayed = _enqueue(db, "test.coalesce", delay=3600)
+    claimed = jobs.claim(["test.coalesce"])
+    assert claimed.id == due
+
+    assert jobs.run(claimed)
+    db.expire_all()
+    assert db.get(models.Job, delayed).status == "queued"
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from app import media_store, models
+from app.database import SessionLocal
+from app.routes.media import _store
+
+def _temp_file(content: bytes) -> tuple[str, str]:
+    path = media_store.temp_path()
+    with open(path, "wb") as f:
+        f.write(content)
+    return path, hashlib.sha256(content).hexdigest()
+
+def _refcount(db, sha256):
+    db.expire_all()
+    blob = db.get(models.MediaBlob, sha256)
+    return None if blob is None else blob.refcount
+
+def _age_release(db, sha256):
+    # Pretend the grace period has passed
+    db.query(models.MediaBlob).filter_by(sha256=sha256).update(
+        {"released_date": datetime.utcnow() - timedelta(hours=2)}
+    )
+    db.commit()
+
+def test_names_share_one_blob_and_release_it(db):
+    path, sha256 = _temp_file(b"shared bytes")
+    assert _store(db, "a.mp4", path, 12, sha256)["deduplicated"] is False
+    path, _ = _temp_file(b"shared bytes")
+    assert _store(db, "b.mp4", path, 12, sha256)["deduplicated"] is True
+    assert not os.path.exists(path)
+    assert _refcount(db, sha256) == 2
+
+    media_store.unlink(db, "a.mp4")
+    media_store.unlink(db, "b.mp4")
+    db.commit()
+    assert _refcount(db, sha256) == 0
+    _age_release(db, sha256)
+    assert media_store.collect_garbage(db, grace_seconds=3600)["blobs_removed"] == 1
+    assert not os.path.exists(media_store.blob_path(sha256))
+
+def test_upload_after_collection_places_the_file_again(db):
+    path, sha256 = _temp_file(b"collected then uploaded again")
+    _store(db, "c.mp4", path, 29, sha256)
+    media_store.unlink(db, "c.mp4")
+    db.commit()
+    _age_release(db, sha256)
+    media_store.collect_garbage(db, grace_seconds=3600)
+    assert _refcount(db, sha256) is None
+
+    path, _ = _temp_file(b"collected then uploaded again")
+    assert _store(db, "c.mp4", path, 29, sha256)["deduplicated"] is False
+    assert os.path.isfile(media_store.blob_path(sha256))
+    assert _refcount(db, sha256) == 1
+
+def test_collection_waits_for_an_upload_holding_a_reference(db):
+    path, sha256 = _temp_file(b"raced by gc")
+    _store(db, "d.mp4", path, 11, sha256)
+    media_store.unlink(db, "d.mp4")
+    db.commit()
+    _age_release(db, sha256)
+
+    # The upload has retained the blob but not yet committed
+    upload = SessionLocal()
+    media_store.link(upload, "e.mp4", sha256, 11, "video/mp4")
+    upload.flush()
+
+    reports = []
+    gc = threading.Thread(target=lambda: reports.append(_collect()))
+    gc.start()
+    time.sleep(0.3)
+    # The file is still there; the upload keeps it and drops its own copy
+    path, _ = _temp_file(b"raced by gc")
+    assert media_store.place_blob(path, sha256) is False
+    upload.commit()
+    upload.close()
+    gc.join()
+
+    assert reports[0]["blobs_removed"] == 0
+    assert os.path.isfile(media_store.blob_path(sha256))
+    assert _refcount(db, sha256) == 1
+
+def _collect():
+    with SessionLocal() as session:
+        return media_store.collect_garbage(session, grace_seconds=3600)
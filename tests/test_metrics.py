@@ -0,0 +1,44 @@
+import asyncio
+import httpx
+from fastapi import Depends, FastAPI
+from app import metrics
+
+def _app(registry):
+    app = FastAPI(dependencies=[Depends(metrics.attribute_route)])
+    entered, release = asyncio.Event(), asyncio.Event()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        entered.set()
+        await release.wait()
+        return {"id": item_id}
+
+    return metrics.MetricsMiddleware(app, registry), entered, release
+
+def test_in_flight_moves_to_the_route_before_the_handler_runs():
+    registry = metrics.Registry()
+
+    async def scenario():
+        app, entered, release = _app(registry)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            request = asyncio.create_task(client.get("/items/7"))
+            await entered.wait()
+            during = dict(registry.in_flight)
+            release.set()
+            await request
+            missing = await client.get("/nope")
+        return during, missing.status_code
+
+    during, missing_status = asyncio.run(scenario())
+    assert during[("GET", "/items/{item_id}")] == 1
+    assert during[("GET", metrics.UNMATCHED_ROUTE)] == 0
+    assert all(count == 0 for count in registry.in_flight.values())
+    assert missing_status == 404
+    assert registry.routes[("GET", metrics.UNMATCHED_ROUTE)].statuses[404] == 1
+    assert registry.routes[("GET", "/items/{item_id}")].statuses[200] == 1
+
+def test_registry_renders_in_flight_per_route():
+    registry = metrics.Registry()
+    registry.in_flight[("GET", "/api/products/")] += 2
+    rendered = registry.render()
+    assert 'http_requests_in_flight{method="GET",route="/api/products/"} 2' in rendered
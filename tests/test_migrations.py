@@ -0,0 +1,81 @@
+import threading
+from sqlalchemy import create_engine, inspect, select
+from app import migrations, storage
+
+def _engine(path):
+    url = f"sqlite:///{path}"
+    engine = create_engine(url, **storage.engine_options(url))
+    storage.configure(engine)
+    return engine
+
+def test_fresh_database_reaches_head_one_step_at_a_time(tmp_path):
+    engine = _engine(tmp_path / "fresh.db")
+    created = {}
+    steps = []
+    for version, name, step in migrations.MIGRATIONS:
+        def recording(connection, step=step, version=version):
+            before = set(inspect(connection).get_table_names())
+            step(connection)
+            created[version] = set(inspect(connection).get_table_names()) - before
+        steps.append((version, name, recording))
+    original = migrations.MIGRATIONS
+    migrations.MIGRATIONS = steps
+    try:
+        assert migrations.upgrade(engine) == [version for version, _, _ in original]
+    finally:
+        migrations.MIGRATIONS = original
+    # The baseline is frozen, so later tables come from their own steps
+    assert created[1] == set(migrations.BASELINE_TABLES)
+    assert created[4] == {"media_blobs", "media_names"}
+    assert created[5] == {"jobs"}
+    assert created[6] == {"cache_versions"}
+    assert created[7] == {"request_events"}
+    assert migrations.current_version(engine) == migrations.HEAD
+
+def test_upgrade_is_idempotent(tmp_path):
+    engine = _engine(tmp_path / "twice.db")
+    assert migrations.upgrade(engine)
+    assert migrations.upgrade(engine) == []
+
+def test_concurrent_upgrades_apply_each_step_once(tmp_path):
+    path = tmp_path / "race.db"
+    engines = [_engine(path) for _ in range(4)]
+    barrier = threading.Barrier(len(engines))
+    results, errors = [], []
+
+    def run(engine):
+        barrier.wait()
+        try:
+            results.append(migrations.upgrade(engine))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=run, args=(engine,)) for engine in engines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    applied = sorted(version for result in results for version in result)
+    assert applied == [version for version, _, _ in migrations.MIGRATIONS]
+    with engines[0].connect() as connection:
+        versions = connection.execute(select(migrations.schema_migrations.c.version)).scalars().all()
+    assert sorted(versions) == applied
+
+def test_failed_step_rolls_back_with_its_version(tmp_path):
+    engine = _engine(tmp_path / "fail.db")
+
+    def broken(connection):
+        raise RuntimeError("boom")
+
+    original = migrations.MIGRATIONS
+    migrations.MIGRATIONS = original[:1] + [(2, "broken", broken)]
+    try:
+        try:
+            migrations.upgrade(engine)
+        except RuntimeError:
+            pass
+    finally:
+        migrations.MIGRATIONS = original
+    # The baseline ran in the same transaction, so nothing was recorded
+    assert migrations.current_version(engine) == 0
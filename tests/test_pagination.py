@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+import pytest
+from app import crud, models
+from app.pagination import InvalidCursor, SortOption, encode_cursor
+
+TYPE = "keyset-test"
+
+@pytest.fixture(scope="module")
+def products(schema):
+    from app.database import SessionLocal
+    posted = datetime(2024, 1, 1)
+    with SessionLocal() as db:
+        # Repeated prices and dates, so pages have to break ties on id
+        rows = [
+            models.Product(
+                name=f"p{i}", type=TYPE, price=float(i % 3), description="d",
+                posted_date=posted + timedelta(days=i // 4),
+            )
+            for i in range(11)
+        ]
+        db.add_all(rows)
+        db.commit()
+        return {row.id: (row.price, row.posted_date) for row in rows}
+
+def _walk(db, sort: SortOption, limit: int):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = crud.get_products(db, type=TYPE, sort=sort, cursor=cursor, limit=limit)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+
+@pytest.mark.parametrize("sort", list(SortOption))
+def test_pages_cover_every_row_once_in_order(db, products, sort):
+    pages = _walk(db, sort, limit=3)
+    ids = [item_id for page in pages for item_id in page]
+    assert sorted(ids) == sorted(products)
+    assert all(len(page) == 3 for page in pages[:-1])
+
+    key = {
+        SortOption.newest: lambda i: (products[i][1], i),
+        SortOption.oldest: lambda i: (products[i][1], i),
+        SortOption.price_asc: lambda i: (products[i][0], i),
+        SortOption.price_desc: lambda i: (products[i][0], i),
+    }[sort]
+    descending = sort in (SortOption.newest, SortOption.price_desc)
+    assert ids == sorted(products, key=key, reverse=descending)
+
+def test_rows_inserted_mid_walk_do_not_shift_pages(db, products):
+    first, cursor = crud.get_products(db, type=TYPE, sort=SortOption.price_asc, limit=4)
+    # Sorts ahead of the cursor; with offsets it would push a row from page one onto page two
+    db.add(models.Product(name="late", type=TYPE, price=-1.0, description="d", posted_date=datetime(2024, 1, 1)))
+    db.commit()
+    try:
+        second, _ = crud.get_products(db, type=TYPE, sort=SortOption.price_asc, cursor=cursor, limit=4)
+        assert not {row.id for row in first} & {row.id for row in second}
+    finally:
+        db.query(models.Product).filter(models.Product.name == "late").delete()
+        db.commit()
+
+def test_cursor_from_another_sort_is_rejected(db, products):
+    _, cursor = crud.get_products(db, type=TYPE, sort=SortOption.newest, limit=2)
+    with pytest.raises(InvalidCursor):
+        crud.get_products(db, type=TYPE, sort=SortOption.price_asc, cursor=cursor, limit=2)
+
+def test_bad_cursor_is_a_400(client, products):
+    assert client.get("/api/products/", params={"cursor": "not-base64!"}).status_code == 400
+    wrong_type = encode_cursor(SortOption.price_asc, "cheap", 1)
+    assert client.get("/api/products/", params={"cursor": wrong_type, "sort": "price_asc"}).status_code == 400
+
+def test_next_cursor_header_walks_the_api(client, products):
+    seen, cursor = [], None
+    while True:
+        params = {"type": TYPE, "limit": 4, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/products/", params=params)
+        assert response.status_code == 200
+        seen += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(products)
+    assert len(seen) == len(set(seen))
@@ -0,0 +1,85 @@
+import asyncio
+import hashlib
+import pytest
+from app import uploads
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+def test_resumed_upload_hashes_every_byte_and_leaves_nothing_behind(tmp_path):
+    part, dest = str(tmp_path / "u1"), str(tmp_path / "u1.complete")
+    uploads.create_part_file(part)
+
+    async def scenario():
+        assert await uploads.append_chunks("u1", part, 0, _chunks(b"abc"), 9, dest) == (3, None)
+        with pytest.raises(uploads.OffsetMismatch):
+            await uploads.append_chunks("u1", part, 0, _chunks(b"def"), 9, dest)
+        # Exceeding the declared size fails the request and drops the running hash
+        with pytest.raises(uploads.UploadTooLarge):
+            await uploads.append_chunks("u1", part, 3, _chunks(b"def", b"ghij"), 9, dest)
+        assert "u1" not in uploads._hashers
+        return await uploads.append_chunks("u1", part, 6, _chunks(b"ghi"), 9, dest)
+
+    offset, sha256 = asyncio.run(scenario())
+    assert offset == 9
+    assert sha256 == hashlib.sha256(b"abcdefghi").hexdigest()
+    assert "u1" not in uploads._locks
+    assert "u1" not in uploads._hashers
+
+def test_hasher_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_HASHER_CACHE_SIZE", 2)
+
+    async def scenario():
+        for upload_id in ("a", "b", "c"):
+            part = str(tmp_path / upload_id)
+            uploads.create_part_file(part)
+            await uploads.append_chunks(upload_id, part, 0, _chunks(b"x"), 2, part + ".complete")
+
+    asyncio.run(scenario())
+    assert list(uploads._hashers) == ["b", "c"]
+    assert uploads._locks == {}
+
+def test_hash_is_rebuilt_when_another_worker_appended(tmp_path):
+    part, dest = str(tmp_path / "u2"), str(tmp_path / "u2.complete")
+    uploads.create_part_file(part)
+
+    async def scenario():
+        await uploads.append_chunks("u2", part, 0, _chunks(b"abc"), 9, dest)
+        # Another worker process takes the second chunk; this one's cached hash is now behind
+        with open(part, "ab") as f:
+            f.write(b"def")
+        return await uploads.append_chunks("u2", part, 6, _chunks(b"ghi"), 9, dest)
+
+    assert asyncio.run(scenario()) == (9, hashlib.sha256(b"abcdefghi").hexdigest())
+
+@pytest.mark.skipif(uploads.fcntl is None, reason="needs flock")
+def test_appends_wait_for_other_processes(tmp_path):
+    part, dest = str(tmp_path / "u3"), str(tmp_path / "u3.complete")
+    uploads.create_part_file(part)
+
+    async def scenario():
+        # A separate open file stands in for another worker holding the lock mid-append
+        with open(part, "ab") as other:
+            uploads.fcntl.flock(other.fileno(), uploads.fcntl.LOCK_EX)
+            task = asyncio.create_task(uploads.append_chunks("u3", part, 3, _chunks(b"def"), 6, dest))
+            await asyncio.sleep(0.2)
+            assert not task.done()
+            other.write(b"abc")
+        return await task
+
+    assert asyncio.run(scenario()) == (6, hashlib.sha256(b"abcdef").hexdigest())
+
+def test_oversized_upload_is_refused_before_the_body_is_read(client, monkeypatch):
+    from app.routes import media
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_SIZE", 1024)
+    monkeypatch.setattr(media, "MULTIPART_OVERHEAD", 1024)
+    # Not even valid multipart: the route has to answer from the headers alone
+    response = client.post(
+        "/api/upload-video/",
+        content=b"x" * 8192,
+        headers={"Content-Type": "multipart/form-data; boundary=b", "Content-Length": "8192"},
+    )
+    assert response.status_code == 413
+    response = client.post("/api/upload-video/", files={"file": ("small.mp4", b"tiny", "video/mp4")})
+    assert response.status_code == 200